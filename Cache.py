@@ -0,0 +1,63 @@
+import sys
+from collections import OrderedDict
+
+
+class LRUCache:
+    # Bounded both by entry count and by the summed sizeof() of the values, the least recently used entries are
+    # evicted first when either limit is exceeded.
+    def __init__(self, max_entries=256, max_bytes=32 * 1024 * 1024, sizeof=sys.getsizeof):
+        self.__entries = OrderedDict()
+        self.__max_entries = max_entries
+        self.__max_bytes = max_bytes
+        self.__sizeof = sizeof
+        self.__bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __contains__(self, key):
+        return key in self.__entries
+
+    def get(self, key, default=None):
+        entry = self.__entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.__entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, value):
+        self.invalidate(key)
+        size = self.__sizeof(value)
+        if size > self.__max_bytes or self.__max_entries <= 0:
+            return
+        self.__entries[key] = (value, size)
+        self.__bytes += size
+        while len(self.__entries) > self.__max_entries or self.__bytes > self.__max_bytes:
+            _, (_, evicted) = self.__entries.popitem(last=False)
+            self.__bytes -= evicted
+            self.evictions += 1
+
+    def invalidate(self, key):
+        entry = self.__entries.pop(key, None)
+        if entry is not None:
+            self.__bytes -= entry[1]
+
+    def clear(self):
+        self.__entries.clear()
+        self.__bytes = 0
+
+    def stats(self):
+        return {
+            'entries': len(self.__entries),
+            'bytes': self.__bytes,
+            'max_entries': self.__max_entries,
+            'max_bytes': self.__max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
@@ -0,0 +1,67 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from itertools import count
+
+# prepared statements kept by every connection, more than Database has
+STATEMENT_CACHE = 256
+READERS = 4
+
+memory_databases = count()
+
+
+class ConnectionManager:
+    # Opens a connection to path for every thread that asks for one and lends out up to readers read-only
+    # connections, each used by one thread at a time. In WAL mode the readers keep reading the last commit while a
+    # writer is busy. setup is called with every new connection and whether it is a reader.
+    def __init__(self, path, setup, readers=READERS):
+        self.__path = path
+        self.__uri = False
+        if path == ':memory:':
+            # a plain in-memory database would be a different one for every connection
+            self.__path = 'file:NotesMemory%d?mode=memory&cache=shared' % next(memory_databases)
+            self.__uri = True
+        self.__setup = setup
+        self.__local = threading.local()
+        self.__lock = threading.Lock()
+        self.__connections = []
+        self.__idle_readers = []
+        self.__reader_slots = threading.BoundedSemaphore(readers)
+
+    def __open(self, reader):
+        # connections are closed by close(), from whichever thread calls it
+        connection = sqlite3.connect(self.__path, isolation_level=None, check_same_thread=False,
+                                     cached_statements=STATEMENT_CACHE, uri=self.__uri)
+        self.__setup(connection, reader)
+        with self.__lock:
+            self.__connections.append(connection)
+        return connection
+
+    def connection(self):
+        connection = getattr(self.__local, 'connection', None)
+        if connection is None:
+            connection = self.__local.connection = self.__open(False)
+        return connection
+
+    @contextmanager
+    def reader(self):
+        with self.__reader_slots:
+            with self.__lock:
+                connection = self.__idle_readers.pop() if self.__idle_readers else None
+            if connection is None:
+                connection = self.__open(True)
+            try:
+                yield connection
+            finally:
+                if connection.in_transaction:
+                    connection.rollback()
+                with self.__lock:
+                    self.__idle_readers.append(connection)
+
+    def close(self):
+        with self.__lock:
+            for connection in self.__connections:
+                connection.close()
+            self.__connections.clear()
+            self.__idle_readers.clear()
+        self.__local = threading.local()
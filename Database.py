@@ -1,40 +1,541 @@
+import codecs
 import sqlite3
-from time import time
+import sys
+import threading
+import zlib
+from contextlib import contextmanager
+from functools import partial
+from time import time, monotonic
+
+from Cache import LRUCache
+from Connections import ConnectionManager, READERS
+
+CREATE_SCHEMA_VERSION_TABLE = \
+    '''CREATE TABLE IF NOT EXISTS SchemaVersion(Version INT)'''
+READ_SCHEMA_VERSION = \
+    '''SELECT MAX(Version) FROM SchemaVersion'''
+UPDATE_SCHEMA_VERSION = \
+    '''INSERT INTO SchemaVersion(Version) VALUES (:version)'''
 
 CREATE_PROFILES_TABLE = \
     '''CREATE TABLE IF NOT EXISTS Profiles(Name TEXT, Password TEXT, Icon TEXT, Date INT, PRIMARY KEY(Name))'''
 CREATE_NOTES_TABLE = \
     '''CREATE TABLE IF NOT EXISTS Notes(Title TEXT, Content TEXT, Favorite BOOLEAN, Date INT, Name TEXT)'''
 
+CREATE_KEYED_NOTES_TABLE = \
+    '''CREATE TABLE KeyedNotes(Id INTEGER PRIMARY KEY, Title TEXT, Content TEXT, Favorite BOOLEAN, Date INT,
+       Name TEXT)'''
+COPY_NOTES_TO_KEYED_NOTES = \
+    '''INSERT INTO KeyedNotes(Title, Content, Favorite, Date, Name)
+       SELECT Title, Content, Favorite, Date, Name FROM Notes ORDER BY rowid'''
+DROP_NOTES_TABLE = \
+    '''DROP TABLE Notes'''
+RENAME_KEYED_NOTES_TABLE = \
+    '''ALTER TABLE KeyedNotes RENAME TO Notes'''
+CREATE_NOTES_NAME_DATE_INDEX = \
+    '''CREATE INDEX IF NOT EXISTS NotesNameDate ON Notes(Name, Date)'''
+CREATE_NOTES_NAME_TITLE_INDEX = \
+    '''CREATE INDEX IF NOT EXISTS NotesNameTitle ON Notes(Name, Title)'''
+ADD_PROFILES_NOTE_COUNTER = \
+    '''ALTER TABLE Profiles ADD COLUMN NoteCounter INT NOT NULL DEFAULT 0'''
+INIT_PROFILES_NOTE_COUNTER = \
+    '''UPDATE Profiles SET NoteCounter =
+       (SELECT IFNULL(MAX(CAST(substr(Title, 5) AS INTEGER)), 0) FROM Notes
+        WHERE Notes.Name = Profiles.Name AND Title GLOB 'Note[0-9]*')'''
+CREATE_NOTES_SEARCH_TABLE = \
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS NotesSearch USING fts5(Title, Content, content='Notes', content_rowid='Id',
+       prefix='2 3')'''
+CREATE_NOTES_SEARCH_INSERT_TRIGGER = \
+    '''CREATE TRIGGER IF NOT EXISTS NotesSearchInsert AFTER INSERT ON Notes BEGIN
+       INSERT INTO NotesSearch(rowid, Title, Content) VALUES (new.Id, new.Title, new.Content);
+       END'''
+CREATE_NOTES_SEARCH_DELETE_TRIGGER = \
+    '''CREATE TRIGGER IF NOT EXISTS NotesSearchDelete AFTER DELETE ON Notes BEGIN
+       INSERT INTO NotesSearch(NotesSearch, rowid, Title, Content) VALUES ('delete', old.Id, old.Title, old.Content);
+       END'''
+CREATE_NOTES_SEARCH_UPDATE_TRIGGER = \
+    '''CREATE TRIGGER IF NOT EXISTS NotesSearchUpdate AFTER UPDATE OF Title, Content ON Notes BEGIN
+       INSERT INTO NotesSearch(NotesSearch, rowid, Title, Content) VALUES ('delete', old.Id, old.Title, old.Content);
+       INSERT INTO NotesSearch(rowid, Title, Content) VALUES (new.Id, new.Title, new.Content);
+       END'''
+REBUILD_NOTES_SEARCH = \
+    '''INSERT INTO NotesSearch(NotesSearch) VALUES ('rebuild')'''
+OPTIMIZE_NOTES_SEARCH = \
+    '''INSERT INTO NotesSearch(NotesSearch) VALUES ('optimize')'''
+PREVIEW_LENGTH = 500
+
+# Content is the last column so reading the other ones never has to walk the overflow pages of a large body
+CREATE_PREVIEW_NOTES_TABLE = \
+    '''CREATE TABLE PreviewNotes(Id INTEGER PRIMARY KEY, Name TEXT, Title TEXT, Date INT, Favorite BOOLEAN,
+       Preview TEXT, Content TEXT)'''
+COPY_NOTES_TO_PREVIEW_NOTES = \
+    '''INSERT INTO PreviewNotes(Id, Name, Title, Date, Favorite, Preview, Content)
+       SELECT Id, Name, Title, Date, Favorite, substr(Content, 1, %d), Content FROM Notes''' % PREVIEW_LENGTH
+RENAME_PREVIEW_NOTES_TABLE = \
+    '''ALTER TABLE PreviewNotes RENAME TO Notes'''
+# Autosave appends edits here instead of rewriting Content, positions and lengths are in UTF-16 code units like
+# the ones QTextDocument reports. Any write of the whole Content supersedes the edits.
+CREATE_NOTE_EDITS_TABLE = \
+    '''CREATE TABLE IF NOT EXISTS NoteEdits(Id INTEGER PRIMARY KEY, NoteId INT, Position INT, Removed INT,
+       Added TEXT)'''
+CREATE_NOTE_EDITS_NOTE_ID_INDEX = \
+    '''CREATE INDEX IF NOT EXISTS NoteEditsNoteId ON NoteEdits(NoteId, Id)'''
+CREATE_NOTE_EDITS_CONTENT_TRIGGER = \
+    '''CREATE TRIGGER IF NOT EXISTS NoteEditsContent AFTER UPDATE OF Content ON Notes BEGIN
+       DELETE FROM NoteEdits WHERE NoteId = new.Id;
+       END'''
+CREATE_NOTE_EDITS_DELETE_TRIGGER = \
+    '''CREATE TRIGGER IF NOT EXISTS NoteEditsDelete AFTER DELETE ON Notes BEGIN
+       DELETE FROM NoteEdits WHERE NoteId = old.Id;
+       END'''
+# Bodies of at least COMPRESS_THRESHOLD bytes are stored encoded by a codec named in Codec, NULL for plain text.
+# Size is the length of the plain body in UTF-8 bytes. The full text index reads the plain bodies through the
+# NotesText view, note_content is registered on every connection by Database.
+CREATE_CODEC_NOTES_TABLE = \
+    '''CREATE TABLE CodecNotes(Id INTEGER PRIMARY KEY, Name TEXT, Title TEXT, Date INT, Favorite BOOLEAN,
+       Preview TEXT, Codec TEXT, Size INT, Content BLOB)'''
+COPY_NOTES_TO_CODEC_NOTES = \
+    '''INSERT INTO CodecNotes(Id, Name, Title, Date, Favorite, Preview, Codec, Size, Content)
+       SELECT Id, Name, Title, Date, Favorite, Preview, NULL, IFNULL(length(CAST(Content AS BLOB)), 0), Content
+       FROM Notes'''
+RENAME_CODEC_NOTES_TABLE = \
+    '''ALTER TABLE CodecNotes RENAME TO Notes'''
+DROP_NOTES_SEARCH_TABLE = \
+    '''DROP TABLE NotesSearch'''
+CREATE_NOTES_TEXT_VIEW = \
+    '''CREATE VIEW IF NOT EXISTS NotesText AS SELECT Id, Title, note_content(Codec, Content) AS Content FROM Notes'''
+CREATE_NOTES_TEXT_SEARCH_TABLE = \
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS NotesSearch USING fts5(Title, Content, content='NotesText',
+       content_rowid='Id', prefix='2 3')'''
+CREATE_NOTES_TEXT_SEARCH_INSERT_TRIGGER = \
+    '''CREATE TRIGGER IF NOT EXISTS NotesSearchInsert AFTER INSERT ON Notes BEGIN
+       INSERT INTO NotesSearch(rowid, Title, Content) VALUES (new.Id, new.Title, note_content(new.Codec, new.Content));
+       END'''
+CREATE_NOTES_TEXT_SEARCH_DELETE_TRIGGER = \
+    '''CREATE TRIGGER IF NOT EXISTS NotesSearchDelete AFTER DELETE ON Notes BEGIN
+       INSERT INTO NotesSearch(NotesSearch, rowid, Title, Content)
+       VALUES ('delete', old.Id, old.Title, note_content(old.Codec, old.Content));
+       END'''
+CREATE_NOTES_TEXT_SEARCH_UPDATE_TRIGGER = \
+    '''CREATE TRIGGER IF NOT EXISTS NotesSearchUpdate AFTER UPDATE OF Title, Content ON Notes BEGIN
+       INSERT INTO NotesSearch(NotesSearch, rowid, Title, Content)
+       VALUES ('delete', old.Id, old.Title, note_content(old.Codec, old.Content));
+       INSERT INTO NotesSearch(rowid, Title, Content) VALUES (new.Id, new.Title, note_content(new.Codec, new.Content));
+       END'''
+# the notes of a section are listed in pages, each one seeking past the (Date, Id) of the last row of the one before
+CREATE_NOTES_NAME_FAVORITE_DATE_INDEX = \
+    '''CREATE INDEX IF NOT EXISTS NotesNameFavoriteDate ON Notes(Name, Favorite, Date)'''
+# The search index is kept up to date by the write methods of Database, which have the plain text at hand. Triggers
+# calling note_content left every connection without it, the sqlite3 shell or a script, unable to write to Notes.
+# NotesText is only read for snippets and by a rebuild.
+DROP_NOTES_SEARCH_INSERT_TRIGGER = \
+    '''DROP TRIGGER IF EXISTS NotesSearchInsert'''
+DROP_NOTES_SEARCH_DELETE_TRIGGER = \
+    '''DROP TRIGGER IF EXISTS NotesSearchDelete'''
+DROP_NOTES_SEARCH_UPDATE_TRIGGER = \
+    '''DROP TRIGGER IF EXISTS NotesSearchUpdate'''
+# Every change to a note takes the next number of the one row of ChangeCounter into the note's Seq, a deleted note
+# leaves its Id and number in NoteTombstones. A reader that remembers the last number it saw reads the notes
+# changed since with a seek on NotesNameSeq. Rewriting a body in another encoding is not a change, an autosaved edit
+# is one.
+CREATE_CHANGE_COUNTER_TABLE = \
+    '''CREATE TABLE IF NOT EXISTS ChangeCounter(Seq INT)'''
+INIT_CHANGE_COUNTER = \
+    '''INSERT INTO ChangeCounter(Seq) VALUES (0)'''
+ADD_NOTES_SEQ = \
+    '''ALTER TABLE Notes ADD COLUMN Seq INT NOT NULL DEFAULT 0'''
+CREATE_NOTES_NAME_SEQ_INDEX = \
+    '''CREATE INDEX IF NOT EXISTS NotesNameSeq ON Notes(Name, Seq)'''
+CREATE_NOTE_TOMBSTONES_TABLE = \
+    '''CREATE TABLE IF NOT EXISTS NoteTombstones(Id INTEGER PRIMARY KEY, Name TEXT, Seq INT)'''
+CREATE_NOTE_TOMBSTONES_NAME_SEQ_INDEX = \
+    '''CREATE INDEX IF NOT EXISTS NoteTombstonesNameSeq ON NoteTombstones(Name, Seq)'''
+CREATE_NOTES_CHANGE_INSERT_TRIGGER = \
+    '''CREATE TRIGGER IF NOT EXISTS NotesChangeInsert AFTER INSERT ON Notes BEGIN
+       UPDATE ChangeCounter SET Seq = Seq + 1;
+       UPDATE Notes SET Seq = (SELECT Seq FROM ChangeCounter) WHERE Id = new.Id;
+       END'''
+CREATE_NOTES_CHANGE_UPDATE_TRIGGER = \
+    '''CREATE TRIGGER IF NOT EXISTS NotesChangeUpdate AFTER UPDATE OF Title, Preview, Date, Favorite ON Notes BEGIN
+       UPDATE ChangeCounter SET Seq = Seq + 1;
+       UPDATE Notes SET Seq = (SELECT Seq FROM ChangeCounter) WHERE Id = new.Id;
+       END'''
+CREATE_NOTES_CHANGE_DELETE_TRIGGER = \
+    '''CREATE TRIGGER IF NOT EXISTS NotesChangeDelete AFTER DELETE ON Notes BEGIN
+       UPDATE ChangeCounter SET Seq = Seq + 1;
+       INSERT OR REPLACE INTO NoteTombstones(Id, Name, Seq) SELECT old.Id, old.Name, Seq FROM ChangeCounter;
+       END'''
+CREATE_NOTE_EDITS_CHANGE_TRIGGER = \
+    '''CREATE TRIGGER IF NOT EXISTS NoteEditsChange AFTER INSERT ON NoteEdits BEGIN
+       UPDATE ChangeCounter SET Seq = Seq + 1;
+       UPDATE Notes SET Seq = (SELECT Seq FROM ChangeCounter) WHERE Id = new.NoteId;
+       END'''
+
+# AUTOINCREMENT keeps the Id of a deleted note from being given to the next one, an Id another instance or a
+# NoteCLI run holds on to never names a different note. Seq moves before Content with the rebuild. The view and the
+# trigger that refer to Notes are dropped first, renaming a table checks every reference in the schema.
+CREATE_AUTOINCREMENT_NOTES_TABLE = \
+    '''CREATE TABLE AutoincrementNotes(Id INTEGER PRIMARY KEY AUTOINCREMENT, Name TEXT, Title TEXT, Date INT,
+       Favorite BOOLEAN, Preview TEXT, Codec TEXT, Size INT, Seq INT NOT NULL DEFAULT 0, Content BLOB)'''
+COPY_NOTES_TO_AUTOINCREMENT_NOTES = \
+    '''INSERT INTO AutoincrementNotes(Id, Name, Title, Date, Favorite, Preview, Codec, Size, Seq, Content)
+       SELECT Id, Name, Title, Date, Favorite, Preview, Codec, Size, Seq, Content FROM Notes'''
+DROP_NOTES_TEXT_VIEW = \
+    '''DROP VIEW NotesText'''
+DROP_NOTE_EDITS_CHANGE_TRIGGER = \
+    '''DROP TRIGGER NoteEditsChange'''
+RENAME_AUTOINCREMENT_NOTES_TABLE = \
+    '''ALTER TABLE AutoincrementNotes RENAME TO Notes'''
+# the Ids deleted before the rebuild are not given out again either
+DELETE_NOTES_SEQUENCE = \
+    '''DELETE FROM sqlite_sequence WHERE name = 'Notes' '''
+INIT_NOTES_SEQUENCE = \
+    '''INSERT INTO sqlite_sequence(name, seq)
+       VALUES ('Notes', MAX((SELECT IFNULL(MAX(Id), 0) FROM Notes), (SELECT IFNULL(MAX(Id), 0) FROM NoteTombstones)))'''
+# Each entry upgrades the schema by one version. Entries are only ever appended, a Notes.db file records the
+# last version it was upgraded to in SchemaVersion and only runs the entries after it.
+MIGRATIONS = [
+    # 1: the original unkeyed tables
+    [CREATE_PROFILES_TABLE, CREATE_NOTES_TABLE],
+    # 2: integer keyed Notes with indexes for the per profile lookups
+    [CREATE_KEYED_NOTES_TABLE, COPY_NOTES_TO_KEYED_NOTES, DROP_NOTES_TABLE, RENAME_KEYED_NOTES_TABLE,
+     CREATE_NOTES_NAME_DATE_INDEX, CREATE_NOTES_NAME_TITLE_INDEX],
+    # 3: per profile counter for the default NoteN titles
+    [ADD_PROFILES_NOTE_COUNTER, INIT_PROFILES_NOTE_COUNTER],
+    # 4: full text index over titles and contents
+    [CREATE_NOTES_SEARCH_TABLE, CREATE_NOTES_SEARCH_INSERT_TRIGGER, CREATE_NOTES_SEARCH_DELETE_TRIGGER,
+     CREATE_NOTES_SEARCH_UPDATE_TRIGGER, REBUILD_NOTES_SEARCH],
+    # 5: stored previews, with the bodies moved to the end of the row
+    [CREATE_PREVIEW_NOTES_TABLE, COPY_NOTES_TO_PREVIEW_NOTES, DROP_NOTES_TABLE, RENAME_PREVIEW_NOTES_TABLE,
+     CREATE_NOTES_NAME_DATE_INDEX, CREATE_NOTES_NAME_TITLE_INDEX, CREATE_NOTES_SEARCH_INSERT_TRIGGER,
+     CREATE_NOTES_SEARCH_DELETE_TRIGGER, CREATE_NOTES_SEARCH_UPDATE_TRIGGER],
+    # 6: append only log of autosaved edits
+    [CREATE_NOTE_EDITS_TABLE, CREATE_NOTE_EDITS_NOTE_ID_INDEX, CREATE_NOTE_EDITS_CONTENT_TRIGGER,
+     CREATE_NOTE_EDITS_DELETE_TRIGGER],
+    # 7: per note codec and plain size, the bodies themselves are compressed by Database.compress_notes
+    [CREATE_CODEC_NOTES_TABLE, COPY_NOTES_TO_CODEC_NOTES, DROP_NOTES_SEARCH_TABLE, DROP_NOTES_TABLE,
+     RENAME_CODEC_NOTES_TABLE, CREATE_NOTES_NAME_DATE_INDEX, CREATE_NOTES_NAME_TITLE_INDEX, CREATE_NOTES_TEXT_VIEW,
+     CREATE_NOTES_TEXT_SEARCH_TABLE, CREATE_NOTES_TEXT_SEARCH_INSERT_TRIGGER, CREATE_NOTES_TEXT_SEARCH_DELETE_TRIGGER,
+     CREATE_NOTES_TEXT_SEARCH_UPDATE_TRIGGER, REBUILD_NOTES_SEARCH, CREATE_NOTE_EDITS_CONTENT_TRIGGER,
+     CREATE_NOTE_EDITS_DELETE_TRIGGER],
+    # 8: index for the paged listing of favorites and the other notes, the Id is part of every index entry
+    [CREATE_NOTES_NAME_FAVORITE_DATE_INDEX],
+    # 9: change numbers, so other instances can read what changed instead of everything
+    [CREATE_CHANGE_COUNTER_TABLE, INIT_CHANGE_COUNTER, ADD_NOTES_SEQ, CREATE_NOTES_NAME_SEQ_INDEX,
+     CREATE_NOTE_TOMBSTONES_TABLE, CREATE_NOTE_TOMBSTONES_NAME_SEQ_INDEX, CREATE_NOTES_CHANGE_INSERT_TRIGGER,
+     CREATE_NOTES_CHANGE_UPDATE_TRIGGER, CREATE_NOTES_CHANGE_DELETE_TRIGGER, CREATE_NOTE_EDITS_CHANGE_TRIGGER],
+    # 10: the search index is written by Database instead of by triggers
+    [DROP_NOTES_SEARCH_INSERT_TRIGGER, DROP_NOTES_SEARCH_DELETE_TRIGGER, DROP_NOTES_SEARCH_UPDATE_TRIGGER],
+    # 11: Ids that are never given out twice
+    [CREATE_AUTOINCREMENT_NOTES_TABLE, COPY_NOTES_TO_AUTOINCREMENT_NOTES, DROP_NOTES_TEXT_VIEW,
+     DROP_NOTE_EDITS_CHANGE_TRIGGER, DROP_NOTES_TABLE, RENAME_AUTOINCREMENT_NOTES_TABLE, DELETE_NOTES_SEQUENCE,
+     INIT_NOTES_SEQUENCE, CREATE_NOTES_NAME_DATE_INDEX, CREATE_NOTES_NAME_TITLE_INDEX,
+     CREATE_NOTES_NAME_FAVORITE_DATE_INDEX, CREATE_NOTES_NAME_SEQ_INDEX, CREATE_NOTES_TEXT_VIEW,
+     CREATE_NOTE_EDITS_CONTENT_TRIGGER, CREATE_NOTE_EDITS_DELETE_TRIGGER, CREATE_NOTES_CHANGE_INSERT_TRIGGER,
+     CREATE_NOTES_CHANGE_UPDATE_TRIGGER, CREATE_NOTES_CHANGE_DELETE_TRIGGER, CREATE_NOTE_EDITS_CHANGE_TRIGGER],
+]
+# the version that introduced Codec, a database upgraded past it has its existing bodies compressed
+CODEC_SCHEMA_VERSION = 7
+
 CREATE_PROFILE = \
     '''INSERT INTO Profiles(Name, Password, Icon, Date) VALUES (:name, :password, NULL, :date)'''
 READ_PROFILE = \
     '''SELECT * FROM Profiles WHERE Name=:name'''
 UPDATE_PROFILE = ''''''
 DELETE_PROFILE = ''''''
+UPDATE_PROFILE_ICON = \
+    '''UPDATE Profiles SET Icon=:icon WHERE Name=:name'''
 READ_PROFILES = \
     '''SELECT * FROM Profiles'''
+READ_NOTE_COUNTER = \
+    '''SELECT NoteCounter FROM Profiles WHERE Name=:name'''
+UPDATE_NOTE_COUNTER = \
+    '''UPDATE Profiles SET NoteCounter=:counter WHERE Name=:name'''
 
 CREATE_NOTE = \
-    '''INSERT INTO Notes (Title, Content, Date, Name, Favorite) VALUES (:title, :content, :date, :name, :favorite);'''
+    '''INSERT INTO Notes (Title, Preview, Codec, Size, Content, Date, Name, Favorite)
+       VALUES (:title, :preview, :codec, :size, :content, :date, :name, :favorite);'''
 READ_NOTE = \
-    '''SELECT Title, Content, Date, Favorite FROM Notes WHERE Title=:title AND Name=:name'''
+    '''SELECT Title, note_content(Codec, Content), Date, Favorite, Id FROM Notes WHERE Id=:id AND Name=:name'''
 UPDATE_NOTE = \
-    '''UPDATE Notes SET Title =:newTitle, Content =:content, Favorite =:favorite WHERE Title =:oldTitle AND Date =:date
-       AND Name =:name;'''
+    '''UPDATE Notes SET Title =:title, Preview =:preview, Codec =:codec, Size =:size, Content =:content,
+       Favorite =:favorite WHERE Id =:id AND Name =:name;'''
+UPDATE_NOTE_FAVORITE = \
+    '''UPDATE Notes SET Favorite =:favorite WHERE Id =:id AND Name =:name AND Favorite !=:favorite'''
 DELETE_NOTE = \
-    '''DELETE FROM Notes WHERE Title =:title AND Name =:name;'''
+    '''DELETE FROM Notes WHERE Id =:id AND Name =:name;'''
+READ_NOTE_EXISTS = \
+    '''SELECT 1 FROM Notes WHERE Title=:title AND Name=:name LIMIT 1'''
 READ_NOTES = \
-    '''SELECT Title, Content, Date, Favorite FROM Notes WHERE Name=:name ORDER BY Date'''
+    '''SELECT Title, note_content(Codec, Content), Date, Favorite, Id FROM Notes WHERE Name=:name ORDER BY Date'''
+READ_NOTE_PREVIEWS = \
+    '''SELECT Title, Preview, Date, Favorite, Id FROM Notes WHERE Name=:name ORDER BY Date'''
+READ_NOTE_PREVIEW = \
+    '''SELECT Title, Preview, Date, Favorite, Id FROM Notes WHERE Id=:id AND Name=:name'''
+READ_NOTE_PAGE = \
+    '''SELECT Title, Preview, Date, Favorite, Id FROM Notes
+       WHERE Name=:name AND Favorite=:favorite AND (Date, Id) > (:date, :id) ORDER BY Date, Id LIMIT :limit'''
+READ_NOTE_HEADER = \
+    '''SELECT Title, Date, Favorite, Id, Size FROM Notes WHERE Id=:id AND Name=:name'''
+READ_NOTE_SEARCH_TEXT = \
+    '''SELECT Title, note_content(Codec, Content) FROM Notes WHERE Id=:id AND Name=:name'''
+READ_NOTE_IDS_AFTER = \
+    '''SELECT Id FROM Notes WHERE Id > :after ORDER BY Id'''
+READ_LAST_NOTE_ID = \
+    '''SELECT IFNULL(MAX(Id), 0) FROM Notes'''
+INSERT_NOTE_SEARCH = \
+    '''INSERT INTO NotesSearch(rowid, Title, Content) VALUES (:id, :title, :content)'''
+DELETE_NOTE_SEARCH = \
+    '''INSERT INTO NotesSearch(NotesSearch, rowid, Title, Content) VALUES ('delete', :id, :title, :content)'''
+READ_NOTE_CODEC = \
+    '''SELECT Codec FROM Notes WHERE Id=:id AND Name=:name'''
+UPDATE_NOTE_CONTENT = \
+    '''UPDATE Notes SET Preview =:preview, Codec =:codec, Size =:size, Content =:content
+       WHERE Id =:id AND Name =:name'''
+READ_UNCOMPRESSED_NOTES = \
+    '''SELECT Id, Content FROM Notes WHERE Codec IS NULL AND Size >= :threshold AND Id > :after
+       AND NOT EXISTS (SELECT 1 FROM NoteEdits WHERE NoteEdits.NoteId = Notes.Id) ORDER BY Id LIMIT :limit'''
+UPDATE_NOTE_ENCODING = \
+    '''UPDATE Notes SET Codec =:codec, Content =:content WHERE Id =:id'''
+CREATE_NOTE_EDIT = \
+    '''INSERT INTO NoteEdits(NoteId, Position, Removed, Added)
+       SELECT Id, :position, :removed, :added FROM Notes WHERE Id=:id AND Name=:name'''
+READ_NOTE_EDITS = \
+    '''SELECT Position, Removed, Added FROM NoteEdits WHERE NoteId=:id ORDER BY Id'''
+READ_NOTE_HAS_EDITS = \
+    '''SELECT EXISTS (SELECT 1 FROM NoteEdits WHERE NoteId=:id)'''
+COUNT_NOTE_EDITS = \
+    '''SELECT COUNT(*) FROM NoteEdits WHERE NoteId=:id'''
+SEARCH_NOTES = \
+    '''SELECT Notes.Title, snippet(NotesSearch, 1, :open, :close, '...', 16), Notes.Date, Notes.Favorite, Notes.Id
+       FROM NotesSearch JOIN Notes ON Notes.Id = NotesSearch.rowid
+       WHERE NotesSearch MATCH :query AND Notes.Name = :name ORDER BY NotesSearch.rank LIMIT :limit'''
+READ_NOTE_STATS = \
+    '''SELECT COUNT(*), TOTAL(Favorite), TOTAL(Size), COUNT(Codec) FROM Notes WHERE Name=:name'''
+COUNT_PROFILE_NOTE_EDITS = \
+    '''SELECT COUNT(*) FROM Notes JOIN NoteEdits ON NoteEdits.NoteId = Notes.Id WHERE Notes.Name=:name'''
+READ_DATA_VERSION = \
+    '''PRAGMA data_version'''
+READ_CHANGE_SEQ = \
+    '''SELECT Seq FROM ChangeCounter'''
+# The change numbers a connection takes itself, collected by a trigger only that connection has, so the changes it
+# reads back are the ones made elsewhere. Numbers are dropped once read_note_changes is past them.
+CREATE_OWN_CHANGES_TABLE = \
+    '''CREATE TEMP TABLE IF NOT EXISTS OwnChanges(Seq INTEGER PRIMARY KEY)'''
+CREATE_OWN_CHANGES_TRIGGER = \
+    '''CREATE TEMP TRIGGER IF NOT EXISTS OwnChange AFTER UPDATE OF Seq ON main.ChangeCounter BEGIN
+       INSERT OR IGNORE INTO OwnChanges(Seq) VALUES (new.Seq);
+       END'''
+DELETE_OWN_CHANGES = \
+    '''DELETE FROM OwnChanges WHERE Seq <= :seq'''
+READ_CHANGED_NOTES = \
+    '''SELECT Title, Preview, Date, Favorite, Id FROM Notes WHERE Name=:name AND Seq > :after AND Seq <= :seq
+       AND Seq NOT IN (SELECT Seq FROM OwnChanges) ORDER BY Seq LIMIT :limit'''
+READ_NOTE_TOMBSTONES = \
+    '''SELECT Id FROM NoteTombstones WHERE Name=:name AND Seq > :after AND Seq <= :seq
+       AND Seq NOT IN (SELECT Seq FROM OwnChanges) ORDER BY Seq LIMIT :limit'''
+EXPORT_NOTES = \
+    '''SELECT Id, Title, note_content(Codec, Content), Date, Favorite,
+       EXISTS (SELECT 1 FROM NoteEdits WHERE NoteEdits.NoteId = Notes.Id) FROM Notes WHERE Name=:name ORDER BY Date'''
+
+SEARCH_LIMIT = 200
+NOTE_PAGE_SIZE = 50
+# where the first page starts
+FIRST_PAGE = (float('-inf'), 0)
+# autosaved edits are folded into the note once this many are pending
+COMPACT_EDITS = 256
+# bytes of UTF-8 per block when a note body is streamed
+CONTENT_BLOCK_SIZE = 64 * 1024
+NOTE_CACHE_ENTRIES = 64
+NOTE_CACHE_BYTES = 16 * 1024 * 1024
+# more changed notes than this are not patched in one by one, the notes are read again instead
+CHANGE_LIMIT = 200
+
+# Codecs by the name stored in Notes.Codec, each is a (compress, decompress, decompressobj) triple working on
+# bytes the way the zlib functions do. Names are only ever added, rows keep the name they were written with.
+CODECS = {
+    # level 1 keeps most of the ratio of the default level at several times its speed on note text
+    'zlib': (partial(zlib.compress, level=1), zlib.decompress, zlib.decompressobj),
+}
+# smaller bodies are stored as plain text, compressing them saves little and costs a call per read
+COMPRESS_THRESHOLD = 4096
+# rows compressed per transaction by compress_notes
+COMPRESS_BATCH = 100
+# import_notes inserts this many notes, or as many as hold IMPORT_BATCH_BYTES of text, per executemany
+IMPORT_BATCH = 500
+IMPORT_BATCH_BYTES = 8 * 1024 * 1024
+
+
+def search_expression(text):
+    # Every word the user typed is quoted so FTS5 operators and punctuation are matched literally, the last one is
+    # a prefix so results show up while the word is still being typed.
+    words = ['"' + word.replace('"', '""') + '"' for word in text.split()]
+    if not words:
+        return None
+    return ' '.join(words) + '*'
+
+
+class ThreadState(threading.local):
+    # what a Database keeps apart for every thread using it
+    def __init__(self):
+        self.depth = 0
+        # the GroupCommit of the connection, None without a commit_interval
+        self.group = None
+        self.plain_cursor = None
+        self.cursor = None
+        self.generation = None
+        # the connection and cursor of reading() while in one
+        self.reader = None
+        self.stream = None
+
+
+class GroupCommit:
+    # The transaction a thread keeps open between its blocks while a commit_interval groups them. When the thread
+    # does not write again before the interval runs out, a timer commits it, so the write lock is never held longer.
+    def __init__(self, connection, interval):
+        self.__connection = connection
+        self.__interval = interval
+        self.__lock = threading.Lock()
+        # the thread is in a block, the timer must not commit half of it
+        self.__busy = False
+        self.__last_commit = monotonic()
+        self.__timer = None
+
+    def hold(self):
+        with self.__lock:
+            self.__busy = True
+            self.__cancel()
+
+    def release(self, execute):
+        # after the outermost block, commits when the interval has run out and otherwise when it will have
+        with self.__lock:
+            self.__busy = False
+            if not self.__connection.in_transaction:
+                return
+            remaining = self.__last_commit + self.__interval - monotonic()
+            if remaining <= 0:
+                self.__commit(execute)
+            else:
+                self.__timer = threading.Timer(remaining, self.__expire)
+                self.__timer.daemon = True
+                self.__timer.start()
+
+    def commit(self, execute):
+        with self.__lock:
+            self.__cancel()
+            self.__commit(execute)
+
+    def close(self):
+        # commits from whichever thread closes the Database, unless the owner is in the middle of a block
+        with self.__lock:
+            self.__cancel()
+            if not self.__busy:
+                self.__commit(self.__connection.execute)
+
+    def __expire(self):
+        with self.__lock:
+            self.__timer = None
+            if not self.__busy:
+                self.__commit(self.__connection.execute)
+
+    def __cancel(self):
+        if self.__timer is not None:
+            self.__timer.cancel()
+            self.__timer = None
+
+    def __commit(self, execute):
+        if self.__connection.in_transaction:
+            execute('COMMIT')
+        self.__last_commit = monotonic()
+
+
+class NoteAdded:
+    def __init__(self, note):
+        self.note = note
+
+
+class NoteRemoved:
+    def __init__(self, noteId):
+        self.noteId = noteId
+
+
+class NoteUpdated:
+    def __init__(self, note):
+        self.note = note
+
+
+class NoteChanged(NoteUpdated):
+    # a note added or updated through another connection, found by Profile.read_changes
+    pass
+
+
+class NotesReloaded:
+    # too many notes changed elsewhere to patch them in one by one, whatever shows notes reads them again
+    pass
+
+
+def apply_note_edits(content, edits):
+    data = bytearray(content.encode('utf-16-le'))
+    for position, removed, added in edits:
+        data[position * 2:(position + removed) * 2] = added.encode('utf-16-le')
+    return data.decode('utf-16-le', errors='replace')
+
+
+def note_size(note):
+    return sys.getsizeof(note[0]) + sys.getsizeof(note[1])
+
+
+def note_content(codec, content):
+    if codec is None:
+        return content
+    return CODECS[codec][1](content).decode('utf-8')
+
+
+class EncodedContent:
+    # Sequential reader of an encoded body, read_note_block keeps one between calls so streaming a note decodes
+    # it once instead of from the start for every block.
+    def __init__(self, noteId, codec, length):
+        self.noteId = noteId
+        self.length = length
+        self.offset = 0
+        self.__encoded_offset = 0
+        self.__pending = b''
+        self.__decompressor = CODECS[codec][2]()
+
+    def read(self, blob, size):
+        data = bytearray(self.__pending)
+        self.__pending = b''
+        while len(data) < size and not self.__decompressor.eof:
+            encoded = self.__decompressor.unconsumed_tail
+            if not encoded:
+                blob.seek(self.__encoded_offset)
+                encoded = blob.read(CONTENT_BLOCK_SIZE)
+                if not encoded:
+                    break
+                self.__encoded_offset += len(encoded)
+            data += self.__decompressor.decompress(encoded, size - len(data))
+        self.offset += len(data)
+        return bytes(data)
+
+    def unread(self, data):
+        # the bytes of a character cut in half by the block end, they start the next read
+        self.offset -= len(data)
+        self.__pending = data
 
 
 class Profile:
-    def __init__(self, database):
+    def __init__(self, database, cache_entries=NOTE_CACHE_ENTRIES, cache_bytes=NOTE_CACHE_BYTES):
         self.__database = database
         self.__name = None
         self.__password = None
         self.__date_created = None
         self.__notes = []
+        self.__listeners = []
+        # full note records by Id, kept up to date by every write that goes through this profile
+        self.__cache = LRUCache(cache_entries, cache_bytes, note_size)
+        # what read_changes saw last, set by watch_changes
+        self.__data_version = None
+        self.__seq = None
 
     def get_name(self):
         return self.__name
@@ -45,40 +546,405 @@ class Profile:
         self.__date_created = date_created
 
     def reload(self):
-        self.__notes = self.__database.read_notes(self.__name)
+        self.__notes = self.__database.read_note_previews(self.__name)
+        return self.__notes
 
     def get_notes(self):
         return self.__notes
 
+    def set_icon(self, icon):
+        self.__database.set_profile_icon(self.__name, icon)
+
+    def read_note_page(self, favorite, after=FIRST_PAGE, limit=NOTE_PAGE_SIZE):
+        return self.__database.read_note_page(self.__name, favorite, after, limit)
+
+    def iterate_notes(self, favorite, limit=NOTE_PAGE_SIZE):
+        # the previews of the favorites or of the other notes in date order, read limit at a time
+        after = FIRST_PAGE
+        while after is not None:
+            notes, after = self.read_note_page(favorite, after, limit)
+            yield from notes
+
+    def add_listener(self, listener):
+        self.__listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self.__listeners.remove(listener)
+
+    def __emit(self, event):
+        for listener in self.__listeners:
+            listener(event)
+
+    def watch_changes(self):
+        # read_changes reports the changes other connections make after this call, both have to run on the same
+        # thread
+        self.__database.watch_own_changes()
+        self.__data_version = self.__database.read_data_version()
+        self.__seq = self.__database.read_change_seq()
+
+    def read_changes(self):
+        # Emits what other connections changed since the last call: NoteRemoved for the deleted notes and NoteChanged
+        # for the others, or one NotesReloaded for more than CHANGE_LIMIT. While nothing is committed elsewhere a
+        # call costs one PRAGMA.
+        # Returns whether anything was emitted.
+        if self.__seq is None:
+            return False
+        version = self.__database.read_data_version()
+        if version == self.__data_version:
+            return False
+        self.__data_version = version
+        notes, deleted, self.__seq = self.__database.read_note_changes(self.__name, self.__seq)
+        if notes is None:
+            self.__cache.clear()
+            self.__emit(NotesReloaded())
+            return True
+        for noteId in deleted:
+            self.__cache.invalidate(noteId)
+            self.__emit(NoteRemoved(noteId))
+        for note in notes:
+            self.__cache.invalidate(note[4])
+            self.__emit(NoteChanged(note))
+        return bool(notes or deleted)
+
     def create_note(self):
-        flag = True
-        i = 1
-        while flag:
-            title = 'Note' + str(i)
-            flag = not self.__database.create_note(self.__name, title)
-            i += 1
+        self.create_notes(1)
+
+    def create_notes(self, count):
+        notes = self.__database.create_notes(self.__name, count)
+        for note in notes:
+            self.__emit(NoteAdded(note))
+        return notes
+
+    def read_note(self, noteId, compact=True):
+        # Edits appended by another connection are not in the cached note, a note that has any is read again, and
+        # with compact folded in like compact_note does.
+        edited = self.__database.has_note_edits(noteId)
+        if edited and compact:
+            return self.compact_note(noteId)
+        note = None if edited else self.__cache.get(noteId)
+        if note is None:
+            note = self.__database.read_note(noteId, self.__name, compact)
+            if note is not None:
+                self.__cache.put(noteId, note)
+        return note
 
-    def read_note(self, title):
-        return self.__database.read_note(title, self.__name)
+    def append_note_edits(self, noteId, edits):
+        self.__cache.invalidate(noteId)
+        if self.__database.append_note_edits(self.__name, noteId, edits) >= COMPACT_EDITS:
+            self.compact_note(noteId)
 
-    def update_note(self, oldTitle, date, newTitle, content, favorite):
-        return self.__database.update_note(self.__name, oldTitle, newTitle, content, favorite, date)
+    def compact_note(self, noteId):
+        note = self.__database.compact_note(self.__name, noteId)
+        if note is not None:
+            self.__cache.put(noteId, note)
+            self.__emit(NoteUpdated((note[0], note[1][:PREVIEW_LENGTH], note[2], note[3], noteId)))
+        return note
 
-    def delete_note(self, title):
-        self.__database.delete_note(title, self.__name)
+    def write_note_content(self, noteId, content):
+        note = self.__database.write_note_content(self.__name, noteId, content)
+        self.__cache.invalidate(noteId)
+        if note is not None:
+            self.__emit(NoteUpdated(note))
+
+    def read_note_header(self, noteId):
+        return self.__database.read_note_header(noteId, self.__name)
+
+    def read_note_block(self, noteId, offset, size=CONTENT_BLOCK_SIZE):
+        return self.__database.read_note_block(noteId, self.__name, offset, size)
+
+    def get_cache_stats(self):
+        return self.__cache.stats()
+
+    def import_notes(self, notes):
+        # no events for these, there can be thousands, the notes are shown by the next reload
+        return self.__database.import_notes(self.__name, notes)
+
+    def export_notes(self):
+        return self.__database.export_notes(self.__name)
+
+    def search_notes(self, query, limit=SEARCH_LIMIT):
+        return self.__database.search_notes(self.__name, query, limit)
+
+    def favorite_note(self, noteId, favorite):
+        note = self.__database.favorite_note(self.__name, noteId, favorite)
+        if note is None:
+            return False
+        cached = self.__cache.get(noteId)
+        if cached is not None:
+            self.__cache.put(noteId, cached[:3] + (favorite, noteId))
+        self.__emit(NoteUpdated(note))
+        return True
+
+    def favorite_notes(self, noteIds, favorite):
+        # no events, like import_notes. Returns the number of notes changed.
+        noteIds = list(noteIds)
+        for noteId in noteIds:
+            self.__cache.invalidate(noteId)
+        return self.__database.favorite_notes(self.__name, noteIds, favorite)
+
+    def get_stats(self):
+        return self.__database.read_note_stats(self.__name)
+
+    def update_note(self, noteId, date, title, content, favorite):
+        if not self.__database.update_note(self.__name, noteId, title, content, favorite):
+            return False
+        self.__cache.put(noteId, (title, content, date, favorite, noteId))
+        self.__emit(NoteUpdated((title, content[:PREVIEW_LENGTH], date, favorite, noteId)))
+        return True
+
+    def delete_note(self, noteId):
+        self.__database.delete_note(noteId, self.__name)
+        self.__cache.invalidate(noteId)
+        self.__emit(NoteRemoved(noteId))
+
+
+# the names of the statements above by their SQL, metrics report statements under them
+STATEMENT_NAMES = {value: name for name, value in list(globals().items()) if name.isupper() and isinstance(value, str)}
 
 
 class Database:
-    def __init__(self):
+    # synchronous and cache_size are passed to the PRAGMAs of the same name. With a commit_interval (in
+    # milliseconds) finished transactions are grouped and committed together at most that often, a crash loses
+    # the uncommitted group but never part of a transaction. A group is committed when the interval runs out even
+    # if nothing is written after it, so the write lock is not kept from other connections for longer. Bodies
+    # written from now on are compressed with codec, one of CODECS or None to store them all as plain text. With
+    # instrument every statement is counted and timed, the ones that take slow_query_ms (Metrics.SLOW_QUERY_MS by
+    # default) or longer are also logged. Turned off, the cursor is the plain sqlite3 one and Metrics is not even
+    # imported.
+    #
+    # Every thread gets its own connection, cursor and transaction, so a Database can be shared between threads.
+    # Statements in a reading() block run on one of up to readers read-only connections instead.
+    def __init__(self, path='Notes.db', synchronous='NORMAL', cache_size=-8000, commit_interval=0, codec='zlib',
+                 instrument=False, slow_query_ms=None, readers=READERS):
         super().__init__()
-        self.connection = sqlite3.connect('Notes.db')
-        self.cursor = self.connection.cursor()
-        self.cursor.execute(CREATE_PROFILES_TABLE)
-        self.cursor.execute(CREATE_NOTES_TABLE)
-        self.connection.commit()
+        self.__synchronous = synchronous
+        self.__cache_size = int(cache_size)
+        self.__metrics = None
+        self.__slow_query_ms = slow_query_ms
+        self.__instrumented = False
+        self.__generation = 0
+        self.__state = ThreadState()
+        self.__groups = []
+        self.__groups_lock = threading.Lock()
+        self.__connections = ConnectionManager(path, self.__setup_connection, readers)
+        self.set_instrumented(instrument)
+        self.__commit_interval = commit_interval / 1000
+        self.__codec = codec
+        self.__migrate()
+
+    def __setup_connection(self, connection, reader):
+        # transactions are managed by transaction(), not by the sqlite3 module
+        connection.create_function('note_content', 2, note_content, deterministic=True)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=' + self.__synchronous)
+        connection.execute('PRAGMA cache_size=' + str(self.__cache_size))
+        if reader:
+            connection.execute('PRAGMA query_only=ON')
+
+    def __wrap_cursor(self, cursor):
+        if self.__instrumented:
+            from Metrics import InstrumentedCursor
+            return InstrumentedCursor(cursor, self.__metrics)
+        return cursor
+
+    @property
+    def connection(self):
+        state = self.__state
+        if state.reader is not None:
+            return state.reader[0]
+        return self.__connections.connection()
+
+    @property
+    def cursor(self):
+        state = self.__state
+        if state.reader is not None:
+            return state.reader[1]
+        if state.generation != self.__generation:
+            # instrumentation was switched, the wrapper changes but the sqlite3 cursor stays the same
+            if state.plain_cursor is None:
+                state.plain_cursor = self.__connections.connection().cursor()
+            elif state.cursor is not state.plain_cursor:
+                state.cursor.finish()
+            state.cursor = self.__wrap_cursor(state.plain_cursor)
+            state.generation = self.__generation
+        return state.cursor
+
+    @contextmanager
+    def reading(self):
+        # Runs the statements of the block on a pooled read-only connection, which reads the last commit and waits
+        # neither for nor on the writes of other threads.
+        state = self.__state
+        if state.reader is not None:
+            yield self
+            return
+        with self.__connections.reader() as connection:
+            state.reader = (connection, self.__wrap_cursor(connection.cursor()))
+            try:
+                yield self
+            finally:
+                if not isinstance(state.reader[1], sqlite3.Cursor):
+                    state.reader[1].finish()
+                state.reader = None
+
+    def __migrate(self):
+        # The version is read again under the write lock before every step, so when two processes open an old
+        # database at once each step runs in one of them and the other skips it.
+        version = None
+        while True:
+            with self.transaction():
+                self.cursor.execute(CREATE_SCHEMA_VERSION_TABLE)
+                current = self.get_schema_version()
+                if version is None:
+                    version = current
+                if current >= len(MIGRATIONS):
+                    break
+                for statement in MIGRATIONS[current]:
+                    self.cursor.execute(statement)
+                self.cursor.execute(UPDATE_SCHEMA_VERSION, {'version': current + 1})
+            self.flush()
+        self.flush()
+
+        if version < CODEC_SCHEMA_VERSION:
+            self.compress_notes()
+
+    def __encode(self, content):
+        # returns the codec, the plain size and the value to store for a body
+        data = content.encode('utf-8')
+        if self.__codec is not None and len(data) >= COMPRESS_THRESHOLD:
+            encoded = CODECS[self.__codec][0](data)
+            if len(encoded) < len(data):
+                return self.__codec, len(data), encoded
+        return None, len(data), content
+
+    def compress_notes(self, batch=COMPRESS_BATCH):
+        # Compresses the plain bodies that are large enough, a batch per transaction so the database stays usable
+        # in between. Notes with autosaved edits are left for their next compaction. Returns the number compressed.
+        # The text stays the same, so the search index does too.
+        if self.__codec is None:
+            return 0
+        compressed = 0
+        after = 0
+        while True:
+            with self.transaction():
+                self.cursor.execute(READ_UNCOMPRESSED_NOTES,
+                                    {'threshold': COMPRESS_THRESHOLD, 'after': after, 'limit': batch})
+                rows = self.cursor.fetchall()
+                for noteId, content in rows:
+                    codec, size, content = self.__encode(content)
+                    if codec is not None:
+                        self.cursor.execute(UPDATE_NOTE_ENCODING, {'codec': codec, 'content': content, 'id': noteId})
+                        compressed += 1
+            self.flush()
+            if len(rows) < batch:
+                break
+            after = rows[-1][0]
+        return compressed
+
+    def rebuild_search(self):
+        # Indexes every note again, for when Notes was written by a connection that does not keep the index, like
+        # the sqlite3 shell. Takes as long as reading every body.
+        with self.transaction():
+            self.cursor.execute(REBUILD_NOTES_SEARCH)
+            self.cursor.execute(OPTIMIZE_NOTES_SEARCH)
+        self.flush()
+
+    def __index_note(self, noteId, title, content):
+        self.cursor.execute(INSERT_NOTE_SEARCH, {'id': noteId, 'title': title, 'content': content})
+
+    def __unindex_note(self, name, noteId):
+        # Takes the note out of the search index as it is stored now, before it is rewritten or deleted. Returns
+        # whether the profile has the note.
+        self.cursor.execute(READ_NOTE_SEARCH_TEXT, {'id': noteId, 'name': name})
+        note = self.cursor.fetchone()
+        if note is None:
+            return False
+        self.cursor.execute(DELETE_NOTE_SEARCH, {'id': noteId, 'title': note[0], 'content': note[1]})
+        return True
+
+    @contextmanager
+    def transaction(self):
+        # Every block runs in its own savepoint so a failing block is undone on its own, even when it is nested
+        # or shares a group commit with blocks that already finished.
+        state = self.__state
+        group = self.__group_commit() if state.depth == 0 else None
+        if group is not None:
+            group.hold()
+        try:
+            if not self.connection.in_transaction:
+                self.cursor.execute('BEGIN IMMEDIATE')
+            savepoint = 'Batch' + str(state.depth)
+            self.cursor.execute('SAVEPOINT ' + savepoint)
+        except BaseException:
+            if group is not None:
+                group.release(self.cursor.execute)
+            raise
+        state.depth += 1
+        try:
+            yield self
+        except BaseException:
+            self.cursor.execute('ROLLBACK TO ' + savepoint)
+            raise
+        finally:
+            state.depth -= 1
+            self.cursor.execute('RELEASE ' + savepoint)
+            if group is not None:
+                group.release(self.cursor.execute)
+            elif state.depth == 0:
+                self.flush()
+
+    def flush(self):
+        state = self.__state
+        if state.depth != 0:
+            return
+        group = self.__group_commit()
+        if group is not None:
+            group.commit(self.cursor.execute)
+        elif self.connection.in_transaction:
+            self.cursor.execute('COMMIT')
+
+    def __group_commit(self):
+        state = self.__state
+        if state.group is None and self.__commit_interval > 0:
+            state.group = GroupCommit(self.__connections.connection(), self.__commit_interval)
+            with self.__groups_lock:
+                self.__groups.append(state.group)
+        return state.group
+
+    def __get_metrics(self):
+        if self.__metrics is None:
+            from Metrics import QueryMetrics, SLOW_QUERY_MS
+            slow_query_ms = SLOW_QUERY_MS if self.__slow_query_ms is None else self.__slow_query_ms
+            self.__metrics = QueryMetrics(dict(STATEMENT_NAMES), slow_query_ms)
+        if self.__instrumented:
+            self.cursor.finish()
+        return self.__metrics
+
+    def set_instrumented(self, instrument):
+        # every thread picks the change up with its next statement
+        if instrument:
+            self.__get_metrics()
+        self.__instrumented = instrument
+        self.__generation += 1
+
+    def is_instrumented(self):
+        return self.__instrumented
+
+    def get_metrics(self):
+        return self.__get_metrics().snapshot()
+
+    def reset_metrics(self):
+        self.__get_metrics().reset()
+
+    def export_metrics(self, path):
+        self.__get_metrics().export(path)
+
+    def get_schema_version(self):
+        self.cursor.execute(READ_SCHEMA_VERSION)
+        return self.cursor.fetchone()[0] or 0
 
     def get_profiles(self):
-        return self.cursor.execute(READ_PROFILES)
+        self.cursor.execute(READ_PROFILES)
+        return self.cursor.fetchall()
 
     def read_profile(self, name):
         self.cursor.execute(READ_PROFILE, {'name': name})
@@ -86,73 +952,412 @@ class Database:
 
         return data
 
+    def open_profile(self, name):
+        # the Profile called name, None when there is none
+        data = self.read_profile(name)
+        if data is None:
+            return None
+        profile = Profile(self)
+        profile.init(data[0], data[1], data[3])
+        return profile
+
     def create_profile(self, name, password):
-        self.cursor.execute(READ_PROFILE, {'name': name})
-        data = self.cursor.fetchone()
+        with self.transaction():
+            self.cursor.execute(READ_PROFILE, {'name': name})
+            data = self.cursor.fetchone()
 
-        if data is None:
-            self.cursor.execute(CREATE_PROFILE, {'name': name, 'password': password, 'date': int(time())})
-            self.connection.commit()
-            return True
-        else:
-            return False
+            if data is None:
+                self.cursor.execute(CREATE_PROFILE, {'name': name, 'password': password, 'date': int(time())})
+                return True
+            else:
+                return False
+
+    def set_profile_icon(self, name, icon):
+        # icon is the encoded thumbnail or None, the column is typed TEXT but keeps the bytes as a BLOB
+        with self.transaction():
+            self.cursor.execute(UPDATE_PROFILE_ICON, {'name': name, 'icon': icon})
 
     def create_note(self, name, title):
-        self.cursor.execute(READ_NOTE, {'title': title, 'name': name})
-        data = self.cursor.fetchone()
+        with self.transaction():
+            self.cursor.execute(READ_NOTE_EXISTS, {'title': title, 'name': name})
+            data = self.cursor.fetchone()
 
-        if data is None:
-            self.cursor.execute(CREATE_NOTE,
-                                {
-                                    'title': title,
-                                    'content': '',
-                                    'date': time(),
-                                    'name': name,
-                                    'favorite': False
-                                })
-            self.connection.commit()
-            return True
-        else:
-            return False
+            if data is None:
+                self.cursor.execute(CREATE_NOTE,
+                                    {
+                                        'title': title,
+                                        'preview': '',
+                                        'codec': None,
+                                        'size': 0,
+                                        'content': '',
+                                        'date': time(),
+                                        'name': name,
+                                        'favorite': False
+                                    })
+                noteId = self.cursor.lastrowid
+                self.__index_note(noteId, title, '')
+                return noteId
+            else:
+                return None
+
+    def __allocate_note_titles(self, name, count):
+        # NoteN titles are handed out from a per profile counter, the existence check only matters for notes
+        # that were renamed to NoteN by hand and costs a single index lookup.
+        self.cursor.execute(READ_NOTE_COUNTER, {'name': name})
+        counter = self.cursor.fetchone()[0]
+        titles = []
+        while len(titles) < count:
+            counter += 1
+            title = 'Note' + str(counter)
+            self.cursor.execute(READ_NOTE_EXISTS, {'title': title, 'name': name})
+            if self.cursor.fetchone() is None:
+                titles.append(title)
+        self.cursor.execute(UPDATE_NOTE_COUNTER, {'counter': counter, 'name': name})
+        return titles
+
+    def create_notes(self, name, count):
+        # one statement per note, executemany would not tell the Id of each
+        notes = []
+        with self.transaction():
+            date = time()
+            for title in self.__allocate_note_titles(name, count):
+                self.cursor.execute(CREATE_NOTE,
+                                    {
+                                        'title': title,
+                                        'preview': '',
+                                        'codec': None,
+                                        'size': 0,
+                                        'content': '',
+                                        'date': date,
+                                        'name': name,
+                                        'favorite': False
+                                    })
+                noteId = self.cursor.lastrowid
+                self.__index_note(noteId, title, '')
+                notes.append((title, '', date, False, noteId))
+        return notes
+
+    def __free_title(self, name, title, taken):
+        # title, or the first of "title (2)", "title (3)"... that neither the profile nor taken has
+        candidate = title
+        suffix = 1
+        while True:
+            if candidate not in taken:
+                self.cursor.execute(READ_NOTE_EXISTS, {'title': candidate, 'name': name})
+                if self.cursor.fetchone() is None:
+                    taken.add(candidate)
+                    return candidate
+            suffix += 1
+            candidate = '%s (%d)' % (title, suffix)
+
+    def import_notes(self, name, notes, batch=IMPORT_BATCH, batch_bytes=IMPORT_BATCH_BYTES):
+        # Adds (title, content, date, favorite) records to the profile, all of them or, on an error, none. notes can
+        # be any iterable, it is consumed a bounded batch at a time. A title the profile already has is numbered.
+        # Returns the number of notes imported.
+        imported = 0
+        with self.transaction():
+            rows = []
+            size = 0
+            # titles of the batch that is not inserted yet
+            taken = set()
+            # the plain bodies of the batch, for the search index
+            texts = []
+            for title, content, date, favorite in notes:
+                codec, plain_size, encoded = self.__encode(content)
+                rows.append({
+                    'title': self.__free_title(name, title, taken),
+                    'preview': content[:PREVIEW_LENGTH],
+                    'codec': codec,
+                    'size': plain_size,
+                    'content': encoded,
+                    'date': date,
+                    'name': name,
+                    'favorite': favorite
+                })
+                texts.append(content)
+                size += plain_size
+                if len(rows) >= batch or size >= batch_bytes:
+                    self.__insert_notes(rows, texts)
+                    imported += len(rows)
+                    rows = []
+                    texts = []
+                    size = 0
+                    taken.clear()
+            if rows:
+                self.__insert_notes(rows, texts)
+                imported += len(rows)
+        return imported
+
+    def __insert_notes(self, rows, texts):
+        # executemany does not tell the Ids, the new rows are the ones after the last Id in the order inserted
+        self.cursor.execute(READ_LAST_NOTE_ID)
+        after = self.cursor.fetchone()[0]
+        self.cursor.executemany(CREATE_NOTE, rows)
+        self.cursor.execute(READ_NOTE_IDS_AFTER, {'after': after})
+        self.cursor.executemany(INSERT_NOTE_SEARCH,
+                                ({'id': noteId, 'title': row['title'], 'content': text}
+                                 for (noteId,), row, text in zip(self.cursor.fetchall(), rows, texts)))
+
+    def export_notes(self, name):
+        # Yields the (title, content, date, favorite) of every note of the profile, oldest first, one row at a time.
+        # The rows come from a cursor of their own, the database can be used while they are consumed.
+        cursor = self.__wrap_cursor(self.connection.cursor())
+        cursor.execute(EXPORT_NOTES, {'name': name})
+        for noteId, title, content, date, favorite, edited in cursor:
+            if edited:
+                # what read_note would fold in, without writing the note
+                self.cursor.execute(READ_NOTE_EDITS, {'id': noteId})
+                content = apply_note_edits(content, self.cursor.fetchall())
+            yield title, content, date, favorite
+
+    def read_note(self, noteId, name, compact=True):
+        # Edits left behind by an autosave that was never compacted are folded in first. Without compact they are
+        # only applied to the text returned, nothing is written.
+        self.cursor.execute(READ_NOTE_HAS_EDITS, {'id': noteId})
+        edited = self.cursor.fetchone()[0]
+        if edited and compact:
+            return self.compact_note(name, noteId)
 
-    def read_note(self, title, name):
         self.cursor.execute(READ_NOTE,
-                            {'title': title, 'name': name})
+                            {'id': noteId, 'name': name})
+        note = self.cursor.fetchone()
+        if note is None or not edited:
+            return note
+        self.cursor.execute(READ_NOTE_EDITS, {'id': noteId})
+        return note[0], apply_note_edits(note[1], self.cursor.fetchall()), note[2], note[3], noteId
+
+    def has_note_edits(self, noteId):
+        self.cursor.execute(READ_NOTE_HAS_EDITS, {'id': noteId})
+        return bool(self.cursor.fetchone()[0])
+
+    def read_note_header(self, noteId, name):
+        # everything but the body, which is read with read_note_block, and the body's size in bytes
+        self.cursor.execute(READ_NOTE_HAS_EDITS, {'id': noteId})
+        if self.cursor.fetchone()[0]:
+            self.compact_note(name, noteId)
+
+        self.cursor.execute(READ_NOTE_HEADER, {'id': noteId, 'name': name})
         return self.cursor.fetchone()
 
+    def read_note_block(self, noteId, name, offset, size=CONTENT_BLOCK_SIZE):
+        # Reads about size bytes of the plain body starting at the byte offset, without loading the rest of it.
+        # Returns the text and the offset of the next block, a character cut in half by the block end is left for
+        # the next block. None when the profile has no such note.
+        self.cursor.execute(READ_NOTE_CODEC, {'id': noteId, 'name': name})
+        row = self.cursor.fetchone()
+        if row is None:
+            return None
+        codec = row[0]
+        with self.connection.blobopen('Notes', 'Content', noteId, readonly=True) as blob:
+            if codec is None:
+                blob.seek(offset)
+                data = blob.read(size)
+            else:
+                stream = self.__state.stream
+                if stream is None or (stream.noteId, stream.offset, stream.length) != (noteId, offset, len(blob)):
+                    # not the continuation of the last block read, decoding starts over
+                    stream = self.__state.stream = EncodedContent(noteId, codec, len(blob))
+                    while stream.offset < offset:
+                        stream.read(blob, min(size, offset - stream.offset))
+                data = stream.read(blob, size)
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        text = decoder.decode(data)
+        pending = decoder.getstate()[0]
+        if codec is not None:
+            self.__state.stream.unread(pending)
+        return text, offset + len(data) - len(pending)
+
+    def append_note_edits(self, name, noteId, edits):
+        with self.transaction():
+            self.cursor.executemany(CREATE_NOTE_EDIT,
+                                    ({
+                                        'id': noteId,
+                                        'name': name,
+                                        'position': position,
+                                        'removed': removed,
+                                        'added': added
+                                    } for position, removed, added in edits))
+            self.cursor.execute(COUNT_NOTE_EDITS, {'id': noteId})
+            return self.cursor.fetchone()[0]
+
+    def compact_note(self, name, noteId):
+        with self.transaction():
+            self.cursor.execute(READ_NOTE, {'id': noteId, 'name': name})
+            note = self.cursor.fetchone()
+            if note is None:
+                return None
+            self.cursor.execute(READ_NOTE_EDITS, {'id': noteId})
+            edits = self.cursor.fetchall()
+            if not edits:
+                return None
+
+            content = apply_note_edits(note[1], edits)
+            codec, size, encoded = self.__encode(content)
+            self.cursor.execute(DELETE_NOTE_SEARCH, {'id': noteId, 'title': note[0], 'content': note[1]})
+            self.__index_note(noteId, note[0], content)
+            self.cursor.execute(UPDATE_NOTE_CONTENT,
+                                {
+                                    'preview': content[:PREVIEW_LENGTH],
+                                    'codec': codec,
+                                    'size': size,
+                                    'content': encoded,
+                                    'id': noteId,
+                                    'name': name
+                                })
+            return note[0], content, note[2], note[3], noteId
+
+    def write_note_content(self, name, noteId, content):
+        # The whole body and nothing else, superseding the autosaved edits. Returns the note's preview record, None
+        # when the profile has no such note.
+        with self.transaction():
+            if not self.__unindex_note(name, noteId):
+                return None
+            codec, size, encoded = self.__encode(content)
+            self.cursor.execute(UPDATE_NOTE_CONTENT,
+                                {
+                                    'preview': content[:PREVIEW_LENGTH],
+                                    'codec': codec,
+                                    'size': size,
+                                    'content': encoded,
+                                    'id': noteId,
+                                    'name': name
+                                })
+            self.cursor.execute(READ_NOTE_PREVIEW, {'id': noteId, 'name': name})
+            note = self.cursor.fetchone()
+            self.__index_note(noteId, note[0], content)
+            return note
+
     def read_notes(self, name):
         self.cursor.execute(READ_NOTES,
                             {'name': name})
         return self.cursor.fetchall()
 
-    def delete_note(self, title, name):
-        self.cursor.execute(DELETE_NOTE,
-                            {'title': title, 'name': name})
-        self.connection.commit()
+    def read_note_previews(self, name):
+        self.cursor.execute(READ_NOTE_PREVIEWS,
+                            {'name': name})
+        return self.cursor.fetchall()
 
-    def update_note(self, name, oldTitle, newTitle, content, favorite, date):
-        self.cursor.execute(READ_NOTE, {'title': newTitle, 'name': name})
-        data = self.cursor.fetchall()
-        alreadyExist = False
-        for note in data:
-            if note[2] != date:
-                alreadyExist = True
+    def read_note_page(self, name, favorite, after=FIRST_PAGE, limit=NOTE_PAGE_SIZE):
+        # Returns up to limit of the favorites or the other notes of the profile in date order, starting after the
+        # (date, id) key after, and the key to pass for the next page, None after the last one. Seeking on the index
+        # costs the same for every page, however far into the list it is.
+        self.cursor.execute(READ_NOTE_PAGE,
+                            {
+                                'name': name,
+                                'favorite': favorite,
+                                'date': after[0],
+                                'id': after[1],
+                                'limit': limit + 1
+                            })
+        rows = self.cursor.fetchall()
+        if len(rows) <= limit:
+            return rows, None
+        last = rows[limit - 1]
+        return rows[:limit], (last[2], last[4])
 
-        if alreadyExist:
-            return False
-        else:
+    def search_notes(self, name, query, limit=SEARCH_LIMIT, highlight=('[', ']')):
+        expression = search_expression(query)
+        if expression is None:
+            return []
+        self.cursor.execute(SEARCH_NOTES,
+                            {
+                                'name': name,
+                                'query': expression,
+                                'limit': limit,
+                                'open': highlight[0],
+                                'close': highlight[1]
+                            })
+        return self.cursor.fetchall()
+
+    def delete_note(self, noteId, name):
+        with self.transaction():
+            if self.__unindex_note(name, noteId):
+                self.cursor.execute(DELETE_NOTE,
+                                    {'id': noteId, 'name': name})
+
+    def update_note(self, name, noteId, title, content, favorite):
+        # Notes are told apart by their Id, a title may be given to several. Returns whether the profile has the note.
+        with self.transaction():
+            if not self.__unindex_note(name, noteId):
+                return False
+            codec, size, encoded = self.__encode(content)
+            self.__index_note(noteId, title, content)
             self.cursor.execute(UPDATE_NOTE,
                                 {
-                                    'newTitle': newTitle,
-                                    'content': content,
+                                    'title': title,
+                                    'preview': content[:PREVIEW_LENGTH],
+                                    'codec': codec,
+                                    'size': size,
+                                    'content': encoded,
                                     'favorite': favorite,
-                                    'oldTitle': oldTitle,
-                                    'date': date,
+                                    'id': noteId,
                                     'name': name
                                 })
-            self.connection.commit()
-            return True
+            return self.cursor.rowcount > 0
+
+    def favorite_note(self, name, noteId, favorite):
+        # Only the flag is written, the body is neither read nor indexed again. Returns the note's preview record.
+        with self.transaction():
+            self.cursor.execute(UPDATE_NOTE_FAVORITE, {'favorite': favorite, 'id': noteId, 'name': name})
+            self.cursor.execute(READ_NOTE_PREVIEW, {'id': noteId, 'name': name})
+            return self.cursor.fetchone()
+
+    def favorite_notes(self, name, noteIds, favorite):
+        with self.transaction():
+            self.cursor.executemany(UPDATE_NOTE_FAVORITE,
+                                    ({'favorite': favorite, 'id': noteId, 'name': name} for noteId in noteIds))
+            return self.cursor.rowcount
+
+    def read_note_stats(self, name):
+        # plain bytes are the UTF-8 size of the bodies, compressed notes count as their plain size
+        self.cursor.execute(READ_NOTE_STATS, {'name': name})
+        notes, favorites, size, compressed = self.cursor.fetchone()
+        self.cursor.execute(COUNT_PROFILE_NOTE_EDITS, {'name': name})
+        return {
+            'notes': notes,
+            'favorites': int(favorites),
+            'bytes': int(size),
+            'compressed': compressed,
+            'pending_edits': self.cursor.fetchone()[0]
+        }
+
+    def read_data_version(self):
+        # changes with every commit of another connection, the commits of this thread's connection leave it alone
+        self.cursor.execute(READ_DATA_VERSION)
+        return self.cursor.fetchone()[0]
+
+    def read_change_seq(self):
+        self.cursor.execute(READ_CHANGE_SEQ)
+        return self.cursor.fetchone()[0]
+
+    def watch_own_changes(self):
+        # from now on read_note_changes leaves out the changes made through this thread's connection
+        self.cursor.execute(CREATE_OWN_CHANGES_TABLE)
+        self.cursor.execute(CREATE_OWN_CHANGES_TRIGGER)
+        self.cursor.execute(DELETE_OWN_CHANGES, {'seq': self.read_change_seq()})
+
+    def read_note_changes(self, name, after, limit=CHANGE_LIMIT):
+        # Returns the previews of the notes of the profile changed after the change number after, the Ids of the
+        # ones deleted since, and the number to pass next time. Both lists are None when more than limit notes
+        # changed. Only changes up to the number read first are returned, a commit in between is left for the
+        # next call, which is why no transaction is needed. Needs watch_own_changes first.
+        seq = self.read_change_seq()
+        if seq == after:
+            return [], [], seq
+        arguments = {'name': name, 'after': after, 'seq': seq, 'limit': limit + 1}
+        self.cursor.execute(READ_NOTE_TOMBSTONES, arguments)
+        deleted = [row[0] for row in self.cursor.fetchall()]
+        self.cursor.execute(READ_CHANGED_NOTES, arguments)
+        notes = self.cursor.fetchall()
+        self.cursor.execute(DELETE_OWN_CHANGES, {'seq': seq})
+        if len(notes) + len(deleted) > limit:
+            return None, None, seq
+        return notes, deleted, seq
 
     def closeDB(self):
-        self.connection.commit()
-        self.connection.close()
+        self.flush()
+        with self.__groups_lock:
+            for group in self.__groups:
+                group.close()
+            self.__groups.clear()
+        self.__connections.close()
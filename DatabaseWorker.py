@@ -0,0 +1,120 @@
+import queue
+import threading
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from Connections import READERS
+from Database import Database
+
+# how long the worker waits for a request before committing a pending group commit
+IDLE_FLUSH_TIMEOUT = 0.5
+
+
+class DatabaseWorker(QThread):
+    # emitted from the worker thread, so the connected slots run queued in the GUI thread
+    resultReady = pyqtSignal(object, object)
+    requestFailed = pyqtSignal(Exception)
+    # Opening the database runs its migrations and may compress old notes, which takes a while on a large one. It
+    # is opened once the thread is started, and one of these tells when that is done. Requests submitted before
+    # then wait in the queue; database is None until it is open.
+    databaseReady = pyqtSignal()
+    databaseFailed = pyqtSignal(Exception)
+
+    def __init__(self, path='Notes.db', **options):
+        super().__init__()
+        self.__path = path
+        self.__options = options
+        self.__requests = queue.Queue()
+        self.__ready = threading.Event()
+        self.__error = None
+        # pool threads for submit_read, started on first use
+        self.__readers = None
+        self.database = None
+        self.resultReady.connect(lambda callback, result: callback(result))
+
+    def run(self) -> None:
+        # the connection is opened here so it belongs to the worker thread
+        try:
+            self.database = Database(self.__path, **self.__options)
+        except Exception as error:
+            self.__error = error
+            self.__ready.set()
+            self.databaseFailed.emit(error)
+            return
+        self.__ready.set()
+        self.databaseReady.emit()
+
+        while True:
+            try:
+                request = self.__requests.get(timeout=IDLE_FLUSH_TIMEOUT)
+            except queue.Empty:
+                self.database.flush()
+                continue
+            if request is None:
+                break
+
+            function, args, callback, future = request
+            try:
+                result = function(*args)
+            except Exception as error:
+                if future is not None:
+                    future.set_exception(error)
+                else:
+                    self.requestFailed.emit(error)
+                continue
+
+            if future is not None:
+                future.set_result(result)
+            elif callback is not None:
+                self.resultReady.emit(callback, result)
+
+        self.database.closeDB()
+
+    def wait_ready(self):
+        # blocks until the database is open and returns it, or raises what opening it raised; for callers without
+        # an event loop to get databaseReady in
+        self.__ready.wait()
+        if self.__error is not None:
+            raise self.__error
+        return self.database
+
+    def submit(self, function, *args, callback=None):
+        # function runs in the worker thread, callback gets its result in the GUI thread
+        self.__requests.put((function, args, callback, None))
+
+    def submit_read(self, function, *args, callback=None):
+        # Like submit, but function runs in a pool thread on a read-only connection, so it neither waits for the
+        # worker's queue nor holds up its writes. It sees the last commit and must not write.
+        if self.__readers is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self.__readers = ThreadPoolExecutor(self.__options.get('readers', READERS), 'DatabaseReader')
+        self.__readers.submit(self.__read, function, args, callback)
+
+    def __read(self, function, args, callback):
+        try:
+            with self.database.reading():
+                result = function(*args)
+        except Exception as error:
+            self.requestFailed.emit(error)
+            return
+        if callback is not None:
+            self.resultReady.emit(callback, result)
+
+    def post(self, callback, value):
+        # callback gets value in the GUI thread, lets a running function report progress
+        self.resultReady.emit(callback, value)
+
+    def call(self, function, *args):
+        # blocks the calling thread until function has run, only meant for shutdown paths, which is also why its
+        # import waits until then
+        from concurrent.futures import Future
+
+        future = Future()
+        self.__requests.put((function, args, None, future))
+        return future.result()
+
+    def stop(self):
+        if self.__readers is not None:
+            self.__readers.shutdown(cancel_futures=True)
+        self.__requests.put(None)
+        self.wait()
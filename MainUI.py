@@ -0,0 +1,230 @@
+from PyQt5.QtCore import Qt, pyqtSignal, QTimer
+from PyQt5.QtWidgets import QWidget, QHBoxLayout, QStackedWidget, QLabel, QVBoxLayout, QLineEdit, QMenuBar, QAction, \
+    QFileDialog
+
+from Database import NoteAdded, NoteRemoved, NoteUpdated, NotesReloaded
+from Widgets.Avatars import thumbnail
+from Widgets.MainMenu import CreateNoteButton, NoteListModel, NoteListView
+
+
+def readFirstPages(profile):
+    # the pages hold every change up to here, later ones come in through Profile.read_changes
+    profile.watch_changes()
+    return profile.read_note_page(True), profile.read_note_page(False)
+
+
+def searchPages(profile, text):
+    # search results are not paged, the best matches are all there is
+    notes = profile.search_notes(text)
+    return ([note for note in notes if note[3]], None), ([note for note in notes if not note[3]], None)
+
+
+def setPicture(profile, path):
+    # scaling a large photo down takes a while, it is done by the worker and only the thumbnail is stored
+    icon = None
+    if path is not None:
+        icon = thumbnail(path)
+        if icon is None:
+            return False
+    profile.set_icon(icon)
+    return True
+
+
+class MainUI(QWidget):
+    onLogout = pyqtSignal()
+
+    # the notes by their Id
+    noteOpened = pyqtSignal(int)
+    noteFavorited = pyqtSignal(int, bool)
+    noteDeleted = pyqtSignal(int)
+    noteCreated = pyqtSignal()
+
+    def __init__(self, parent: QStackedWidget):
+        super().__init__(parent)
+
+        self.__favorites = NoteListModel(self, lambda after, callback: self.__fetchPage(True, after, callback))
+        self.__notes = NoteListModel(self, lambda after, callback: self.__fetchPage(False, after, callback))
+        self.__favoritesHint = QLabel('Press right click on the note that you want to add as favorite.')
+        self.__loading = QLabel('Loading notes...')
+        self.__loading.hide()
+        self.__transferStatus = QLabel(self)
+        self.__transferStatus.hide()
+        self.__searchBox = QLineEdit(self)
+        self.__searchBox.setPlaceholderText('Search')
+        self.__searchBox.setClearButtonEnabled(True)
+        # only the newest reload or search may fill the grid
+        self.__request = 0
+        self.__searchTimer = QTimer(self)
+        self.__searchTimer.setSingleShot(True)
+        self.__searchTimer.setInterval(150)
+        self.__searchTimer.timeout.connect(self.__search)
+        self.__searchBox.textChanged.connect(self.__searchTimer.start)
+        self.__metricsDialog = None
+
+        self.__initUI()
+
+    def __str__(self):
+        return 'main'
+
+    def __initUI(self):
+        favorites = QLabel('FAVORITES')
+        notes = QLabel('NOTES')
+
+        self.__menuBar = QMenuBar(self)
+        profileMenu = self.__menuBar.addMenu('Profile')
+        logoutAction = QAction('Logout', self)
+        logoutAction.triggered.connect(lambda: self.onLogout.emit())
+        profileMenu.addAction(logoutAction)
+        profileMenu.addSeparator()
+        for text, slot in [('Set picture...', self.__setPicture),
+                           ('Remove picture', lambda: self.__changePicture(None))]:
+            action = QAction(text, self)
+            action.triggered.connect(slot)
+            profileMenu.addAction(action)
+        profileMenu.addSeparator()
+        for text, slot in [('Import folder...', lambda: self.__importNotes(False)),
+                           ('Import archive...', lambda: self.__importNotes(True)),
+                           ('Export to folder...', lambda: self.__exportNotes(False)),
+                           ('Export archive...', lambda: self.__exportNotes(True))]:
+            action = QAction(text, self)
+            action.triggered.connect(slot)
+            profileMenu.addAction(action)
+        debugMenu = self.__menuBar.addMenu('Debug')
+        metricsAction = QAction('Query metrics...', self)
+        metricsAction.triggered.connect(self.__showMetrics)
+        debugMenu.addAction(metricsAction)
+
+        notesLayout = QHBoxLayout()
+        notesLayout.setAlignment(Qt.AlignTop | Qt.AlignLeft)
+        notesLayout.addWidget(CreateNoteButton(self), 0, Qt.AlignTop)
+        notesLayout.addWidget(NoteListView(self, self.__notes))
+
+        layout = QVBoxLayout()
+        layout.setAlignment(Qt.AlignTop | Qt.AlignLeft)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(10)
+        layout.addWidget(self.__menuBar)
+        layout.addWidget(self.__searchBox)
+        layout.addWidget(self.__loading)
+        layout.addWidget(self.__transferStatus)
+        layout.addWidget(favorites)
+        layout.addWidget(self.__favoritesHint)
+        layout.addWidget(NoteListView(self, self.__favorites))
+        layout.addWidget(notes)
+        layout.addLayout(notesLayout)
+        self.__menuBar.move(0, 0)
+
+        self.setLayout(layout)
+
+    def __showMetrics(self):
+        if self.__metricsDialog is None:
+            # a debugging aid, not worth importing before it is asked for
+            from Widgets.Metrics import QueryMetricsDialog
+            self.__metricsDialog = QueryMetricsDialog(self, self.parent().getWorker())
+        self.__metricsDialog.show()
+        self.__metricsDialog.raise_()
+
+    def __setPicture(self):
+        path, _ = QFileDialog.getOpenFileName(self, 'Profile picture', '', 'Pictures (*.png *.jpg *.jpeg *.bmp *.gif)')
+        if path:
+            self.__changePicture(path)
+
+    def __changePicture(self, path):
+        worker = self.parent().getWorker()
+        worker.submit(setPicture, self.parent().getProfile(), path,
+                      callback=lambda changed: self.__showTransferStatus(
+                          'Profile picture changed' if changed else path + ' is not a picture'))
+
+    def __importNotes(self, archive):
+        if archive:
+            path, _ = QFileDialog.getOpenFileName(self, 'Import notes', '', 'Notes archive (*.jsonl)')
+        else:
+            path = QFileDialog.getExistingDirectory(self, 'Import a folder of .txt and .md files')
+        if path:
+            self.__transfer('import_notes', path, self.__notesImported)
+
+    def __exportNotes(self, archive):
+        if archive:
+            path, _ = QFileDialog.getSaveFileName(self, 'Export notes', 'notes.jsonl', 'Notes archive (*.jsonl)')
+        else:
+            path = QFileDialog.getExistingDirectory(self, 'Export notes to folder')
+        if path:
+            # only reads, the export does not hold up the edits made meanwhile
+            self.__transfer('export_notes', path, lambda stats: self.__showTransferStatus('Exported %s' % stats),
+                            read=True)
+
+    def __transfer(self, name, path, callback, read=False):
+        # imported when first used, like the metrics dialog
+        import Transfer
+
+        worker = self.parent().getWorker()
+        self.__showTransferStatus('Preparing...')
+        submit = worker.submit_read if read else worker.submit
+        submit(getattr(Transfer, name), self.parent().getProfile(), path,
+               lambda stats: worker.post(self.__showTransferStatus, str(stats)), callback=callback)
+
+    def __notesImported(self, stats):
+        self.reloadUI()
+        self.__showTransferStatus('Imported %s' % stats)
+
+    def __showTransferStatus(self, text):
+        self.__transferStatus.setText(text)
+        self.__transferStatus.show()
+
+    def reloadUI(self):
+        self.__transferStatus.hide()
+        self.__searchTimer.stop()
+        self.__searchBox.blockSignals(True)
+        self.__searchBox.clear()
+        self.__searchBox.blockSignals(False)
+        self.__load(readFirstPages, self.parent().getProfile())
+
+    def __search(self):
+        text = self.__searchBox.text()
+        if text.strip():
+            # searching only reads, it can run next to the writes of the worker
+            self.__load(searchPages, self.parent().getProfile(), text, read=True)
+        else:
+            self.__load(readFirstPages, self.parent().getProfile())
+
+    def __fetchPage(self, favorite, after, callback):
+        # on the worker like the first pages, so a page and the note events of the writes stay in order
+        self.parent().getWorker().submit(self.parent().getProfile().read_note_page, favorite, after, callback=callback)
+
+    def __load(self, function, *args, read=False):
+        self.__request += 1
+        request = self.__request
+        self.__loading.show()
+        worker = self.parent().getWorker()
+        submit = worker.submit_read if read else worker.submit
+        submit(function, *args, callback=lambda pages: self.__showNotes(request, pages))
+
+    def __showNotes(self, request, pages):
+        if request != self.__request:
+            return
+        self.__loading.hide()
+        self.__favorites.setNotes(*pages[0])
+        self.__notes.setNotes(*pages[1])
+        self.__favoritesHint.setVisible(self.__favorites.rowCount() == 0)
+
+    def __section(self, note) -> NoteListModel:
+        if note[3]:
+            return self.__favorites
+        return self.__notes
+
+    def applyNoteEvent(self, event):
+        if isinstance(event, NoteAdded):
+            self.__section(event.note).insertNote(event.note)
+        elif isinstance(event, NoteRemoved):
+            if not self.__favorites.removeNote(event.noteId):
+                self.__notes.removeNote(event.noteId)
+        elif isinstance(event, NoteUpdated):
+            section = self.__section(event.note)
+            if not section.updateNote(event.note):
+                # the favorite flag changed, move the card to the other section
+                other = self.__notes if section is self.__favorites else self.__favorites
+                other.removeNote(event.note[4])
+                section.insertNote(event.note)
+        elif isinstance(event, NotesReloaded):
+            self.reloadUI()
+        self.__favoritesHint.setVisible(self.__favorites.rowCount() == 0)
@@ -0,0 +1,173 @@
+import json
+import logging
+import threading
+from bisect import bisect_left
+from collections import deque
+from time import perf_counter, time
+
+# upper bounds of the latency histogram buckets in milliseconds, the last bucket counts everything slower
+LATENCY_BUCKETS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000]
+SLOW_QUERY_MS = 100
+SLOW_QUERY_LOG = 100
+
+slow_query_logger = logging.getLogger('Database.slow')
+
+
+class StatementStats:
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.changes = 0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def record(self, milliseconds, rows, changes):
+        self.calls += 1
+        self.total += milliseconds
+        self.max = max(self.max, milliseconds)
+        self.rows += rows
+        self.changes += changes
+        self.histogram[bisect_left(LATENCY_BUCKETS, milliseconds)] += 1
+
+    def percentile(self, fraction):
+        # the upper bound of the bucket the percentile falls in, the slowest call for the last bucket
+        rank = fraction * self.calls
+        count = 0
+        for bucket, calls in enumerate(self.histogram):
+            count += calls
+            if count >= rank and calls:
+                return LATENCY_BUCKETS[bucket] if bucket < len(LATENCY_BUCKETS) else self.max
+        return 0.0
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'total_ms': self.total,
+            'mean_ms': self.total / self.calls if self.calls else 0.0,
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'max_ms': self.max,
+            'rows': self.rows,
+            'changes': self.changes,
+            'histogram': dict(zip([str(bound) for bound in LATENCY_BUCKETS] + ['inf'], self.histogram))
+        }
+
+
+class QueryMetrics:
+    # Statements are reported under the name of the constant holding their SQL when names knows it, anything else
+    # under its own text. Every thread of a Database records into the same QueryMetrics.
+    def __init__(self, names=None, slow_query_ms=SLOW_QUERY_MS, slow_query_log=SLOW_QUERY_LOG):
+        self.__lock = threading.Lock()
+        self.__names = names or {}
+        self.__statements = {}
+        self.__slow = deque(maxlen=slow_query_log)
+        self.slow_query_ms = slow_query_ms
+
+    def name(self, sql):
+        name = self.__names.get(sql)
+        if name is None:
+            name = self.__names[sql] = ' '.join(sql.split())[:80]
+        return name
+
+    def record(self, sql, seconds, rows, changes):
+        name = self.name(sql)
+        milliseconds = seconds * 1000
+        with self.__lock:
+            stats = self.__statements.get(name)
+            if stats is None:
+                stats = self.__statements[name] = StatementStats()
+            stats.record(milliseconds, rows, changes)
+            slow = milliseconds >= self.slow_query_ms
+            if slow:
+                self.__slow.append({'statement': name, 'ms': milliseconds, 'rows': rows, 'changes': changes,
+                                    'time': time()})
+        if slow:
+            slow_query_logger.warning('%s took %.1f ms, %d rows', name, milliseconds, rows)
+
+    def reset(self):
+        with self.__lock:
+            self.__statements.clear()
+            self.__slow.clear()
+
+    def snapshot(self):
+        with self.__lock:
+            return {
+                'slow_query_ms': self.slow_query_ms,
+                'statements': {name: stats.to_dict() for name, stats in self.__statements.items()},
+                'slow_queries': list(self.__slow)
+            }
+
+    def export(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.snapshot(), file, indent=2)
+
+
+class InstrumentedCursor:
+    # Stands in for a sqlite3 cursor while metrics are recorded. A statement is timed from its execute until its
+    # last row is fetched or the next statement starts, only the time spent inside the cursor counts.
+    def __init__(self, cursor, metrics):
+        self.__cursor = cursor
+        self.__metrics = metrics
+        self.__sql = None
+        self.__elapsed = 0.0
+        self.__rows = 0
+        self.__changes = 0
+
+    def __getattr__(self, name):
+        return getattr(self.__cursor, name)
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def __begin(self, sql, execute, parameters):
+        self.finish()
+        start = perf_counter()
+        execute(sql, parameters)
+        self.__elapsed = perf_counter() - start
+        self.__sql = sql
+        self.__rows = 0
+        self.__changes = max(self.__cursor.rowcount, 0)
+        return self
+
+    def execute(self, sql, parameters=()):
+        return self.__begin(sql, self.__cursor.execute, parameters)
+
+    def executemany(self, sql, parameters):
+        return self.__begin(sql, self.__cursor.executemany, parameters)
+
+    def fetchone(self):
+        start = perf_counter()
+        row = self.__cursor.fetchone()
+        self.__elapsed += perf_counter() - start
+        if row is None:
+            self.finish()
+        else:
+            self.__rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        start = perf_counter()
+        rows = self.__cursor.fetchmany(self.__cursor.arraysize if size is None else size)
+        self.__elapsed += perf_counter() - start
+        self.__rows += len(rows)
+        if not rows:
+            self.finish()
+        return rows
+
+    def fetchall(self):
+        start = perf_counter()
+        rows = self.__cursor.fetchall()
+        self.__elapsed += perf_counter() - start
+        self.__rows += len(rows)
+        self.finish()
+        return rows
+
+    def finish(self):
+        if self.__sql is not None:
+            self.__metrics.record(self.__sql, self.__elapsed, self.__rows, self.__changes)
+            self.__sql = None
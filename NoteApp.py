@@ -1,12 +1,18 @@
 from PyQt5 import QtGui
-from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtCore import Qt, pyqtSignal, QTimer
 from PyQt5.QtGui import QIcon
-from PyQt5.QtWidgets import QWidget, QHBoxLayout, QStackedWidget, QLabel, QVBoxLayout, QPushButton, QLineEdit, \
-    QTextEdit, QMessageBox, QLayout, QMenuBar, QAction
+from PyQt5.QtWidgets import QWidget, QHBoxLayout, QStackedWidget, QLabel, QMessageBox, QLayout, \
+    QSizePolicy
 
-from Database import Database, Profile
-from Widgets.Login import ProfileLoginButton, ProfileCreateButton, ProfileCreatePopup, ProfileLoginPopup
-from Widgets.MainMenu import CreateNoteButton, OpenNoteButton
+from Database import Profile
+from DatabaseWorker import DatabaseWorker
+from Widgets.Login import ProfileLoginButton, ProfileCreateButton, ProfileCreatePopup, ProfileLoginPopup, \
+    profileButtonSize
+from Widgets.Avatars import avatarPixmap
+from Widgets.Resize import ResizeCoordinator
+
+# milliseconds between two looks at Notes.db for changes made elsewhere, one PRAGMA each while there are none
+CHANGE_POLL_INTERVAL = 1000
 
 
 class GUIFormatter:
@@ -22,13 +28,29 @@ class GUIFormatter:
         return layout
 
 
-class NoteApp(QStackedWidget, Database):
-    def __init__(self):
+class NoteApp(QStackedWidget):
+    # Profile events are emitted from the database worker, going through a signal delivers them in the GUI thread
+    noteChanged = pyqtSignal(object)
+
+    # trace is called with the name of every start up phase as it finishes
+    def __init__(self, trace=lambda phase: None):
         super().__init__()
         self.setWindowIcon(QIcon('icon.ico'))
         self.setWindowTitle("Note")
-        self.__profile = Profile(self)
+        self.__worker = DatabaseWorker()
+        self.__worker.requestFailed.connect(self.__showDatabaseError)
+        self.__worker.databaseReady.connect(self.__databaseReady)
+        self.__worker.databaseFailed.connect(self.__databaseFailed)
+        # the login screen is shown while the database is opened, it lists the profiles once that is done
+        self.__worker.start()
+        trace('database')
+        # other instances and NoteCLI may write to Notes.db as well, their changes are looked for while logged in
+        self.__changeTimer = QTimer(self)
+        self.__changeTimer.setInterval(CHANGE_POLL_INTERVAL)
+        self.__changeTimer.timeout.connect(self.__pollChanges)
+        self.__resizeCoordinator = ResizeCoordinator(self, lambda: self.currentWidget().updateGeometry())
         self.__initUI()
+        trace('login screen')
 
     def __iter__(self):
         widgets = []
@@ -37,76 +59,116 @@ class NoteApp(QStackedWidget, Database):
         return iter(widgets)
 
     def __initUI(self):
+        # only the login screen is needed for the first frame, the other screens are built when first shown
         loginWindow = LoginUI(self)
         loginWindow.onLogin.connect(self.__profileLogin)
         loginWindow.onCreate.connect(self.__profileCreate)
         self.addWidget(loginWindow)
+
+        self.showMaximized()
+
+    def __createMainWindow(self):
+        from MainUI import MainUI
+
         mainWindow = MainUI(self)
         mainWindow.onLogout.connect(self.__profileLogout)
         mainWindow.noteOpened.connect(self.__openNote)
         mainWindow.noteFavorited.connect(self.__favoriteNote)
         mainWindow.noteDeleted.connect(self.__deleteNote)
         mainWindow.noteCreated.connect(self.__createNote)
-        self.addWidget(mainWindow)
+        self.noteChanged.connect(mainWindow.applyNoteEvent)
+        return mainWindow
+
+    def __createNoteWindow(self):
+        from NoteUI import NoteUI
+
         noteWindow = NoteUI(self)
         noteWindow.noteExited.connect(self.__noteExit)
-        self.addWidget(noteWindow)
+        self.noteChanged.connect(noteWindow.applyNoteEvent)
+        return noteWindow
 
-        self.showMaximized()
+    def __newProfile(self):
+        self.__profile = Profile(self.__worker.database)
+        self.__profile.add_listener(self.noteChanged.emit)
+
+    def __databaseReady(self):
+        self.__newProfile()
+        self.currentWidget().reloadUI()
+
+    def __databaseFailed(self, error):
+        QMessageBox.critical(self, 'Database error', 'Notes.db could not be opened: %s' % error)
+        self.close()
+
+    def __showDatabaseError(self, error):
+        QMessageBox.critical(self, 'Database error', str(error))
 
     def __noteExit(self):
         self.setCurrentWidget('main')
-        self.currentWidget().reloadUI()
 
-    def __openNote(self, name):
+    def __openNote(self, noteId):
         self.setCurrentWidget('note')
-        self.currentWidget().setNote(name)
+        self.currentWidget().setNote(noteId)
 
-    def __favoriteNote(self, name, mode):
-        note = self.__profile.read_note(name)
-        self.__profile.update_note(note[0], note[2], note[0], note[1], mode)
-        self.currentWidget().reloadUI()
+    def __favoriteNote(self, noteId, mode):
+        self.__worker.submit(self.__profile.favorite_note, noteId, mode)
 
-    def __deleteNote(self, name):
-        self.__profile.delete_note(name)
-        self.currentWidget().reloadUI()
+    def __deleteNote(self, noteId):
+        self.__worker.submit(self.__profile.delete_note, noteId)
+
+    def __pollChanges(self):
+        # on the worker, whose connection is the one the data version is read from
+        self.__worker.submit(self.__profile.read_changes)
 
     def __createNote(self):
-        self.__profile.create_note()
-        self.currentWidget().reloadUI()
+        self.__worker.submit(self.__profile.create_note)
 
     def __profileCreate(self, name):
-        profile = super().read_profile(name)
-        self.__profile.init(profile[0], profile[1], profile[2])
-        self.currentWidget().reloadUI()
-        self.setCurrentWidget('main')
         self.currentWidget().reloadUI()
+        self.__profileLogin(name)
 
     def __profileLogin(self, name):
-        profile = super().read_profile(name)
-        self.__profile.init(profile[0], profile[1], profile[2])
+        self.__worker.submit(self.__worker.database.read_profile, name, callback=self.__showProfile)
+
+    def __showProfile(self, profile):
+        self.__profile.init(profile[0], profile[1], profile[3])
         self.setCurrentWidget('main')
         self.currentWidget().reloadUI()
+        self.__changeTimer.start()
 
     def __profileLogout(self):
+        self.__changeTimer.stop()
         self.setCurrentWidget('login')
+        # the picture may have changed, pictures that did not are not decoded again
+        self.currentWidget().reloadUI()
         del self.__profile
-        self.__profile = Profile(self)
+        self.__newProfile()
 
     def getProfile(self) -> Profile:
         return self.__profile
 
+    def getWorker(self) -> DatabaseWorker:
+        return self.__worker
+
     def setCurrentWidget(self, name: str):
         for widget in self:
             if str(widget) == name:
                 super().setCurrentWidget(widget)
+                # the window may have been resized while the widget was hidden
+                widget.updateGeometry()
+                return
+
+        widget = {'main': self.__createMainWindow, 'note': self.__createNoteWindow}[name]()
+        self.addWidget(widget)
+        super().setCurrentWidget(widget)
 
     def resizeEvent(self, a0: QtGui.QResizeEvent) -> None:
-        self.currentWidget().updateGeometry()
+        self.__resizeCoordinator.resized()
 
     def closeEvent(self, a0: QtGui.QCloseEvent) -> None:
-        self.currentWidget().close()
-        super().closeDB()
+        if not self.currentWidget().close():
+            a0.ignore()
+            return
+        self.__worker.stop()
 
 
 class LoginUI(QWidget, GUIFormatter):
@@ -119,10 +181,16 @@ class LoginUI(QWidget, GUIFormatter):
         self.__layout = QHBoxLayout()
         self.__layout.setAlignment(Qt.AlignCenter)
         self.__layout.setSpacing(10)
+        # the buttons follow the window's size, so their size must not hold the window at it
+        self.__layout.setSizeConstraint(QLayout.SetNoConstraint)
+        self.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Ignored)
         self.popup = None
+        # the size the buttons were last given
+        self.__buttonSize = None
         self.create_button = ProfileCreateButton(self)
         self.profile_buttons = []
-        self.reloadUI()
+        self.__layout.addWidget(QLabel('Loading profiles...'))
+        self.setLayout(self.__layout)
 
     def __str__(self):
         return 'login'
@@ -135,12 +203,17 @@ class LoginUI(QWidget, GUIFormatter):
         self.updateGeometry()
 
     def reloadUI(self):
+        worker = self.parent().getWorker()
+        worker.submit(worker.database.get_profiles, callback=self.__showProfiles)
+
+    def __showProfiles(self, profiles):
+        self.__buttonSize = None
         self.create_button = ProfileCreateButton(self)
         self.profile_buttons = []
         self.__layout = super().clearAllWidgets(self.__layout)
 
-        for profile in self.parent().get_profiles():
-            button = ProfileLoginButton(self, profile[0])
+        for profile in profiles:
+            button = ProfileLoginButton(self, profile[0], avatarPixmap(profile[2]))
             button.clicked.connect(lambda ch, name=profile[0], password=profile[1]:
                                    self.show_login_profile_popup(name, password))
             self.profile_buttons.append(button)
@@ -154,204 +227,25 @@ class LoginUI(QWidget, GUIFormatter):
     def show_create_profile_popup(self):
         self.popup = ProfileCreatePopup(self)
 
-    def create_profile(self, name, password):
-        if self.parent().create_profile(name, password):
+    def create_profile(self, name, password, callback):
+        worker = self.parent().getWorker()
+        worker.submit(worker.database.create_profile, name, password,
+                      callback=lambda created: self.__profileCreated(name, created, callback))
+
+    def __profileCreated(self, name, created, callback):
+        callback(created)
+        if created:
             self.onCreate.emit(name)
-            return True
-        else:
-            return False
 
     def updateGeometry(self) -> None:
-        self.create_button.updateGeometry()
-        for buttons in self.profile_buttons:
-            buttons.updateGeometry()
+        # the buttons only change with the width, most resizes leave them as they are
+        margins = self.__layout.contentsMargins()
+        size = profileButtonSize(self.width() - margins.left() - margins.right(), len(self.profile_buttons) + 1,
+                                 self.__layout.spacing())
+        if size != self.__buttonSize:
+            self.__buttonSize = size
+            self.create_button.setFixedSize(*size)
+            for button in self.profile_buttons:
+                button.setFixedSize(*size)
         if self.popup is not None:
             self.popup.updateGeometry()
-
-
-class MainUI(QWidget, GUIFormatter):
-    onLogout = pyqtSignal()
-
-    noteOpened = pyqtSignal(str)
-    noteFavorited = pyqtSignal(str, bool)
-    noteDeleted = pyqtSignal(str)
-    noteCreated = pyqtSignal()
-
-    def __init__(self, parent: QStackedWidget):
-        super().__init__(parent)
-
-        self.__favorites = QHBoxLayout()
-        self.__favorites.setAlignment(Qt.AlignTop | Qt.AlignLeft)
-        self.__notes = QHBoxLayout()
-        self.__notes.setAlignment(Qt.AlignTop | Qt.AlignLeft)
-
-    def __str__(self):
-        return 'main'
-
-    def __initUI(self):
-        favorites = QLabel('FAVORITES')
-        notes = QLabel('NOTES')
-
-        self.__menuBar = QMenuBar(self)
-        profileMenu = self.__menuBar.addMenu('Profile')
-        logoutAction = QAction('Logout', self)
-        logoutAction.triggered.connect(lambda: self.onLogout.emit())
-        profileMenu.addAction(logoutAction)
-
-        layout = QVBoxLayout()
-        layout.setAlignment(Qt.AlignTop | Qt.AlignLeft)
-        layout.setContentsMargins(0, 0, 0, 0)
-        layout.setSpacing(10)
-        layout.addWidget(self.__menuBar)
-        layout.addWidget(favorites)
-        layout.addLayout(self.__favorites)
-        layout.addWidget(notes)
-        layout.addLayout(self.__notes)
-        self.__menuBar.move(0, 0)
-
-        self.setLayout(layout)
-
-    def reloadUI(self):
-        self.__notes = super().clearAllWidgets(self.__notes)
-        self.__favorites = super().clearAllWidgets(self.__favorites)
-
-        profile = self.parent().getProfile()
-        profile.reload()
-        notes = profile.get_notes()
-        for note in notes:
-            if note[3]:
-                self.__favorites.addWidget(OpenNoteButton(self, note[0], note[3]))
-            else:
-                self.__notes.addWidget(OpenNoteButton(self, note[0], note[3]))
-        self.__notes.addWidget(CreateNoteButton(self))
-
-        if self.__favorites.count() == 0:
-            self.__favorites.addWidget(QLabel('Press right click on the note that you want to add as favorite.'))
-
-        self.__initUI()
-
-
-class NoteUI(QWidget):
-    noteExited = pyqtSignal()
-
-    def __init__(self, parent):
-        super().__init__(parent)
-        self.__titleBox = QLineEdit('', self)
-        self.__titleBox.setPlaceholderText('Title')
-        self.__favoriteButton = QPushButton('')
-        self.__favoriteButton.clicked.connect(self.__toggleFavorite)
-        self.__contentBox = QTextEdit('', self)
-        self.__contentBox.setPlaceholderText('Content')
-        self.__favorite = None
-        self.__date = None
-        self.__title = None
-        self.__content = None
-
-        self.__initUI()
-
-    def __str__(self):
-        return 'note'
-
-    def __initUI(self):
-        back_button = QPushButton('<-')
-        back_button.clicked.connect(self.returnEvent)
-        save_button = QPushButton('save')
-        save_button.clicked.connect(self.__saveButton)
-        if self.__favorite:
-            self.__favoriteButton.setText('added as favorite')
-        else:
-            self.__favoriteButton.setText('add as favorite')
-        layout1 = QHBoxLayout()
-        layout1.addWidget(back_button)
-        layout1.addWidget(self.__titleBox)
-        layout1.addWidget(self.__favoriteButton)
-        layout1.addWidget(save_button)
-
-        main_layout = QVBoxLayout()
-        main_layout.addLayout(layout1, 0)
-        main_layout.addWidget(self.__contentBox)
-
-        self.setLayout(main_layout)
-
-    def reloadUI(self):
-        self.__titleBox.setText(self.__title)
-        self.__contentBox.setText(self.__content)
-
-        if self.__favorite:
-            self.__favoriteButton.setText('added as favorite')
-        else:
-            self.__favoriteButton.setText('add as favorite')
-
-    def __toggleFavorite(self):
-        if not self.__getFavoriteButtonValue():
-            self.__favoriteButton.setText('added as favorite')
-        else:
-            self.__favoriteButton.setText('add as favorite')
-
-    def __getFavoriteButtonValue(self):
-        if self.__favoriteButton.text() == 'added as favorite':
-            return True
-        else:
-            return False
-
-    def __showExitPopup(self, title):
-        if self.__content != self.__contentBox.toPlainText() or self.__title != self.__titleBox.text() or \
-                self.__favorite != self.__getFavoriteButtonValue():
-            saveMessageBox = QMessageBox()
-            saveMessageBox.setWindowTitle(title)
-            saveMessageBox.setText('Do you want to save your progress?')
-            saveMessageBox.setStandardButtons(QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel)
-            return saveMessageBox.exec_()
-        else:
-            return QMessageBox.No
-
-    def __showSaveErrorPopup(self):
-        errorMessageBox = QMessageBox()
-        errorMessageBox.setWindowTitle('Failed saving ' + self.__title)
-        errorMessageBox.setText('Title already exists.')
-        errorMessageBox.setIcon(QMessageBox.Critical)
-        errorMessageBox.exec_()
-
-    def __saveButton(self):
-        if not self.save():
-            self.__showSaveErrorPopup()
-        else:
-            self.setNote(self.__titleBox.text())
-
-    def save(self):
-        return self.parent().getProfile().update_note(self.__title, self.__date, self.__titleBox.text(),
-                                                      self.__contentBox.toPlainText(), self.__getFavoriteButtonValue())
-
-    def setNote(self, title):
-        profile = self.parent().getProfile()
-        note = profile.read_note(title)
-        self.__title = note[0]
-        self.__content = note[1]
-        self.__date = note[2]
-        self.__favorite = note[3]
-
-        self.reloadUI()
-
-    def returnEvent(self):
-        retval = self.__showExitPopup('Go Back')
-
-        if retval == QMessageBox.Yes:
-            if self.save():
-                self.noteExited.emit()
-            else:
-                self.__showSaveErrorPopup()
-        elif retval == QMessageBox.No:
-            self.noteExited.emit()
-
-    def closeEvent(self, a0: QtGui.QCloseEvent) -> None:
-        retval = self.__showExitPopup('Exit')
-
-        if retval == QMessageBox.Yes:
-            if self.save():
-                a0.accept()
-            else:
-                self.__showSaveErrorPopup()
-        elif retval == QMessageBox.No:
-            a0.accept()
-        else:
-            a0.ignore()
@@ -0,0 +1,180 @@
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+from Database import Database, SEARCH_LIMIT
+
+# previews read per page by list, a page is written out before the next one is read
+LIST_PAGE_SIZE = 500
+
+
+def format_date(date):
+    return datetime.fromtimestamp(date).strftime('%Y-%m-%d %H:%M')
+
+
+def write_notes(notes, as_json):
+    # one line per (title, preview or snippet, date, favorite, id) record as it arrives
+    for title, text, date, favorite, noteId in notes:
+        if as_json:
+            line = json.dumps({'id': noteId, 'title': title, 'date': date, 'favorite': bool(favorite), 'text': text},
+                              ensure_ascii=False)
+        else:
+            line = '%d\t%s\t%s\t%s' % (noteId, format_date(date), '*' if favorite else ' ', title)
+        print(line)
+
+
+def list_notes(database, args):
+    profile = open_profile(database, args.profile)
+    sections = [True] if args.favorites else [True, False]
+    for favorite in sections:
+        write_notes(profile.iterate_notes(favorite, LIST_PAGE_SIZE), args.json)
+
+
+def search_notes(database, args):
+    profile = open_profile(database, args.profile)
+    write_notes(profile.search_notes(args.query, args.limit), args.json)
+
+
+def export_notes(database, args):
+    # imported here, the other commands do without it
+    import Transfer
+
+    profile = open_profile(database, args.profile)
+    if args.path == '-':
+        stats = Transfer.TransferStats()
+        Transfer.write_lines(sys.stdout, Transfer.counted(profile.export_notes(), stats))
+        stats.finish()
+    else:
+        stats = Transfer.export_notes(profile, args.path, progress=lambda stats: print(stats, file=sys.stderr))
+    print('Exported %s' % stats, file=sys.stderr)
+
+
+def import_notes(database, args):
+    import Transfer
+
+    profile = open_profile(database, args.profile)
+    stats = Transfer.import_notes(profile, args.path, progress=lambda stats: print(stats, file=sys.stderr))
+    print('Imported %s' % stats, file=sys.stderr)
+
+
+def favorite_notes(database, args):
+    profile = open_profile(database, args.profile)
+    noteIds = args.ids
+    if args.search is not None:
+        noteIds = noteIds + [note[4] for note in profile.search_notes(args.search, args.limit)]
+    changed = profile.favorite_notes(noteIds, not args.remove)
+    print('%s %d notes' % ('Unfavorited' if args.remove else 'Favorited', changed), file=sys.stderr)
+
+
+def show_stats(database, args):
+    names = [args.profile] if args.profile else [profile[0] for profile in database.get_profiles()]
+    profiles = {}
+    for name in names:
+        profiles[name] = open_profile(database, name).get_stats()
+    if args.json:
+        print(json.dumps({'database': database_stats(database, args.database), 'profiles': profiles}))
+        return
+    for key, value in database_stats(database, args.database).items():
+        print('%-16s %s' % (key, value))
+    print('%-12s %8s %10s %12s %11s %14s' % ('profile', 'notes', 'favorites', 'bytes', 'compressed', 'pending edits'))
+    for name, stats in profiles.items():
+        print('%-12s %8d %10d %12d %11d %14d' % (name, stats['notes'], stats['favorites'], stats['bytes'],
+                                                 stats['compressed'], stats['pending_edits']))
+
+
+def database_stats(database, path):
+    return {'file': path, 'file_bytes': os.path.getsize(path), 'schema_version': database.get_schema_version()}
+
+
+def compress_notes(database, args):
+    print('Compressed %d notes' % database.compress_notes(), file=sys.stderr)
+
+
+def reindex_notes(database, args):
+    database.rebuild_search()
+    print('Rebuilt the search index', file=sys.stderr)
+
+
+def open_profile(database, name):
+    profile = database.open_profile(name)
+    if profile is None:
+        sys.exit('There is no profile named %s.' % name)
+    return profile
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser(prog='python -m NoteCLI',
+                                     description='Reads and changes the notes of Notes.db without the GUI.')
+    parser.add_argument('--database', default='Notes.db')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('list', help='the notes of a profile, favorites first, one per line')
+    command.add_argument('profile')
+    command.add_argument('--favorites', action='store_true', help='only the favorites')
+    command.add_argument('--json', action='store_true', help='JSON lines with the preview')
+    command.set_defaults(run=list_notes)
+
+    command = commands.add_parser('search', help='the best matches of a full text search')
+    command.add_argument('profile')
+    command.add_argument('query')
+    command.add_argument('--limit', type=int, default=SEARCH_LIMIT)
+    command.add_argument('--json', action='store_true', help='JSON lines with the matching snippet')
+    command.set_defaults(run=search_notes)
+
+    command = commands.add_parser('export', help='the notes of a profile as a .jsonl archive or a directory')
+    command.add_argument('profile')
+    command.add_argument('path', nargs='?', default='-', help='- (the default) for JSON lines on standard output')
+    command.set_defaults(run=export_notes)
+
+    command = commands.add_parser('import', help='a .jsonl archive or a directory of .txt and .md files')
+    command.add_argument('profile')
+    command.add_argument('path')
+    command.set_defaults(run=import_notes)
+
+    command = commands.add_parser('favorite', help='adds notes to the favorites, or removes them')
+    command.add_argument('profile')
+    command.add_argument('ids', type=int, nargs='*', help='note ids as list prints them')
+    command.add_argument('--search', help='every note a full text search finds, up to --limit')
+    command.add_argument('--limit', type=int, default=SEARCH_LIMIT)
+    command.add_argument('--remove', action='store_true')
+    command.set_defaults(run=favorite_notes)
+
+    command = commands.add_parser('stats', help='note counts and sizes of every profile')
+    command.add_argument('profile', nargs='?')
+    command.add_argument('--json', action='store_true')
+    command.set_defaults(run=show_stats)
+
+    command = commands.add_parser('compress', help='compresses the bodies that were stored as plain text')
+    command.set_defaults(run=compress_notes)
+
+    command = commands.add_parser('reindex', help='rebuilds the search index after Notes was written without NoteCLI '
+                                                  'or the GUI, by the sqlite3 shell for one')
+    command.set_defaults(run=reindex_notes)
+
+    args = parser.parse_args(argv)
+    if args.command == 'favorite' and not args.ids and args.search is None:
+        parser.error('favorite needs note ids or --search')
+    return args
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    if not os.path.exists(args.database):
+        # opening it would create an empty one
+        sys.exit('There is no database at %s.' % args.database)
+    database = Database(args.database)
+    try:
+        args.run(database, args)
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # the reader stopped early, like head does. Python would report the pipe again when it flushes at exit.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+    finally:
+        database.closeDB()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,384 @@
+from PyQt5 import QtGui
+from PyQt5.QtCore import pyqtSignal, QTimer
+from PyQt5.QtGui import QTextCursor, QTextDocument
+from PyQt5.QtWidgets import QWidget, QHBoxLayout, QVBoxLayout, QPushButton, QLineEdit, QTextEdit, QMessageBox, \
+    QCheckBox, QProgressBar
+
+from Database import NoteChanged, NoteRemoved, NotesReloaded
+
+# QTextDocument keeps these in place of the characters toPlainText() returns, one for one
+PLAIN_TEXT = str.maketrans({'\u2029': '\n', '\u2028': '\n', '\ufdd0': '\n', '\ufdd1': '\n', '\u00a0': ' '})
+AUTOSAVE_DEBOUNCE = 500
+AUTOSAVE_MAX_DELAY = 2000
+
+
+def utf16_length(text):
+    return len(text.encode('utf-16-le')) // 2
+
+
+class NoteUI(QWidget):
+    noteExited = pyqtSignal()
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.__titleBox = QLineEdit('', self)
+        self.__titleBox.setPlaceholderText('Title')
+        self.__favoriteButton = QPushButton('')
+        self.__favoriteButton.clicked.connect(self.__toggleFavorite)
+        self.__autosaveBox = QCheckBox('autosave', self)
+        self.__autosaveBox.setChecked(True)
+        self.__autosaveBox.toggled.connect(self.__toggleAutosave)
+        self.__contentBox = QTextEdit('', self)
+        self.__contentBox.setPlaceholderText('Content')
+        self.__contentBox.setAcceptRichText(False)
+        self.__contentBox.document().contentsChange.connect(self.__recordEdit)
+        self.__progressBar = QProgressBar(self)
+        self.__progressBar.setRange(0, 100)
+        self.__progressBar.hide()
+        self.__favorite = None
+        self.__date = None
+        self.__title = None
+        self.__noteId = None
+        # Note bodies are streamed in blocks into a document that is not shown yet, laying out the growing text
+        # on every block would cost far more than inserting it. Only the blocks of the newest setNote are used.
+        self.__request = 0
+        self.__loadingDocument = None
+
+        # Autosave keeps the edits since the last flush and appends them to the note's edit log once typing pauses
+        # for AUTOSAVE_DEBOUNCE ms, or at the latest AUTOSAVE_MAX_DELAY ms after the first unsaved edit.
+        self.__edits = []
+        self.__ignoreEdits = False
+        # a change made elsewhere was not taken over because of edits that were not appended yet
+        self.__stale = False
+        # The document keeps a single separator for a \r\n or a lone \r of the stored body, so edit positions are
+        # off by one for each of them. Such a body is written whole once instead, with \n line ends from then on.
+        self.__rewriteContent = False
+        self.__debounceTimer = QTimer(self)
+        self.__debounceTimer.setSingleShot(True)
+        self.__debounceTimer.setInterval(AUTOSAVE_DEBOUNCE)
+        self.__debounceTimer.timeout.connect(self.__flushEdits)
+        self.__maxDelayTimer = QTimer(self)
+        self.__maxDelayTimer.setSingleShot(True)
+        self.__maxDelayTimer.setInterval(AUTOSAVE_MAX_DELAY)
+        self.__maxDelayTimer.timeout.connect(self.__flushEdits)
+
+        self.__initUI()
+
+    def __str__(self):
+        return 'note'
+
+    def __initUI(self):
+        back_button = QPushButton('<-')
+        back_button.clicked.connect(self.returnEvent)
+        save_button = QPushButton('save')
+        save_button.clicked.connect(self.__saveButton)
+        if self.__favorite:
+            self.__favoriteButton.setText('added as favorite')
+        else:
+            self.__favoriteButton.setText('add as favorite')
+        layout1 = QHBoxLayout()
+        layout1.addWidget(back_button)
+        layout1.addWidget(self.__titleBox)
+        layout1.addWidget(self.__favoriteButton)
+        layout1.addWidget(self.__autosaveBox)
+        layout1.addWidget(save_button)
+
+        main_layout = QVBoxLayout()
+        main_layout.addLayout(layout1, 0)
+        main_layout.addWidget(self.__progressBar)
+        main_layout.addWidget(self.__contentBox)
+
+        self.setLayout(main_layout)
+
+    def reloadUI(self):
+        self.__titleBox.setText(self.__title)
+
+        if self.__favorite:
+            self.__favoriteButton.setText('added as favorite')
+        else:
+            self.__favoriteButton.setText('add as favorite')
+
+    def __toggleFavorite(self):
+        if not self.__getFavoriteButtonValue():
+            self.__favoriteButton.setText('added as favorite')
+        else:
+            self.__favoriteButton.setText('add as favorite')
+
+    def __getFavoriteButtonValue(self):
+        if self.__favoriteButton.text() == 'added as favorite':
+            return True
+        else:
+            return False
+
+    def __toggleAutosave(self, checked):
+        document = self.__contentBox.document()
+        if not checked:
+            self.__flushEdits()
+        elif document.isModified() and self.__noteId is not None:
+            # nothing typed while autosave was off is in the edit log, the positions of new edits would not match
+            self.__writeContent()
+        # with autosave off the flag tells whether there is anything unsaved
+        document.setModified(False)
+
+    def __writeContent(self):
+        self.parent().getWorker().submit(self.parent().getProfile().write_note_content, self.__noteId,
+                                         self.__contentBox.toPlainText())
+
+    def __isAutosaving(self):
+        return self.__autosaveBox.isChecked() and self.__noteId is not None
+
+    def __recordEdit(self, position, removed, added):
+        if self.__ignoreEdits or not self.__isAutosaving():
+            return
+
+        document = self.__contentBox.document()
+        # the document ends in a block separator that is not part of the note
+        end = min(position + added, document.characterCount() - 1)
+        cursor = QTextCursor(document)
+        cursor.setPosition(position)
+        cursor.setPosition(end, QTextCursor.KeepAnchor)
+        text = cursor.selectedText().translate(PLAIN_TEXT)
+
+        if self.__edits and removed == 0:
+            # coalesce typing into the previous insertion
+            lastPosition, lastRemoved, lastText = self.__edits[-1]
+            if position == lastPosition + utf16_length(lastText):
+                self.__edits[-1] = (lastPosition, lastRemoved, lastText + text)
+                text = None
+        if text is not None:
+            self.__edits.append((position, removed, text))
+
+        self.__debounceTimer.start()
+        if not self.__maxDelayTimer.isActive():
+            self.__maxDelayTimer.start()
+
+    def __flushEdits(self):
+        self.__debounceTimer.stop()
+        self.__maxDelayTimer.stop()
+        if self.__edits:
+            if self.__rewriteContent:
+                self.__rewriteContent = False
+                self.__writeContent()
+            else:
+                self.parent().getWorker().submit(self.parent().getProfile().append_note_edits, self.__noteId,
+                                                 self.__edits)
+            self.__edits = []
+            if self.__stale:
+                self.__refresh()
+
+    def __discardEdits(self):
+        # a full save replaces the note's content and with it every pending edit
+        self.__debounceTimer.stop()
+        self.__maxDelayTimer.stop()
+        self.__edits = []
+        self.__stale = False
+        self.__rewriteContent = False
+
+    def __finishAutosave(self):
+        if self.__isAutosaving():
+            self.__flushEdits()
+            self.parent().getWorker().submit(self.parent().getProfile().compact_note, self.__noteId)
+
+    def __showExitPopup(self, title):
+        contentChanged = not self.__isAutosaving() and self.__contentBox.document().isModified()
+        if contentChanged or self.__title != self.__titleBox.text() or \
+                self.__favorite != self.__getFavoriteButtonValue():
+            saveMessageBox = QMessageBox()
+            saveMessageBox.setWindowTitle(title)
+            saveMessageBox.setText('Do you want to save your progress?')
+            saveMessageBox.setStandardButtons(QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel)
+            return saveMessageBox.exec_()
+        else:
+            return QMessageBox.No
+
+    def __showSaveErrorPopup(self):
+        errorMessageBox = QMessageBox()
+        errorMessageBox.setWindowTitle('Failed saving ' + self.__title)
+        errorMessageBox.setText('The note no longer exists.')
+        errorMessageBox.setIcon(QMessageBox.Critical)
+        errorMessageBox.exec_()
+
+    def __saveButton(self):
+        title = self.__titleBox.text()
+        favorite = self.__getFavoriteButtonValue()
+        self.save(lambda saved: self.__saved(title, favorite) if saved else self.__showSaveErrorPopup())
+
+    def __saved(self, title, favorite):
+        self.__title = title
+        self.__favorite = favorite
+        self.__contentBox.document().setModified(False)
+        self.reloadUI()
+
+    def __saveArguments(self):
+        return (self.__noteId, self.__date, self.__titleBox.text(), self.__contentBox.toPlainText(),
+                self.__getFavoriteButtonValue())
+
+    def save(self, callback):
+        self.__discardEdits()
+        self.parent().getWorker().submit(self.parent().getProfile().update_note, *self.__saveArguments(),
+                                         callback=callback)
+
+    def setNote(self, noteId):
+        self.__discardEdits()
+        self.__setLoading(True)
+        self.__request += 1
+        request = self.__request
+        self.parent().getWorker().submit(self.parent().getProfile().read_note_header, noteId,
+                                         callback=lambda note: self.__showNote(request, note))
+
+    def __showNote(self, request, note):
+        if request != self.__request:
+            return
+        if note is None:
+            self.__noteMissing()
+            return
+        self.__title = note[0]
+        self.__date = note[1]
+        self.__favorite = note[2]
+        self.__noteId = note[3]
+        self.reloadUI()
+        self.__loadBlock(request, note[3], 0, note[4])
+
+    def __loadBlock(self, request, noteId, offset, size):
+        if offset >= size:
+            self.__showDocument(self.__loadingDocument)
+            self.__setLoading(False)
+            return
+        self.parent().getWorker().submit(self.parent().getProfile().read_note_block, noteId, offset,
+                                         callback=lambda block: self.__appendBlock(request, noteId, block, size))
+
+    def __appendBlock(self, request, noteId, block, size):
+        if request != self.__request:
+            return
+        if block is None:
+            self.__noteMissing()
+            return
+        # plain text insertion, each block is its own event so the window keeps responding while a large note loads
+        text, offset = block
+        if '\r' in text:
+            self.__rewriteContent = True
+        cursor = QTextCursor(self.__loadingDocument)
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(text)
+        self.__progressBar.setValue(offset * 100 // size)
+        self.__loadBlock(request, noteId, offset, size)
+
+    def __showDocument(self, document):
+        # the replaced document is owned by the editor, which deletes it
+        self.__contentBox.setDocument(document)
+        document.contentsChange.connect(self.__recordEdit)
+
+    def __setLoading(self, loading):
+        self.__ignoreEdits = loading
+        self.__titleBox.setEnabled(not loading)
+        self.__contentBox.setEnabled(not loading)
+        self.__favoriteButton.setEnabled(not loading)
+        self.__progressBar.setVisible(loading)
+        if loading:
+            self.__progressBar.setValue(0)
+            self.__titleBox.clear()
+            self.__contentBox.clear()
+            self.__contentBox.setPlaceholderText('Loading...')
+            self.__loadingDocument = QTextDocument(self.__contentBox)
+            # the blocks of a note are not something to undo
+            self.__loadingDocument.setUndoRedoEnabled(False)
+        else:
+            document = self.__contentBox.document()
+            document.setUndoRedoEnabled(True)
+            document.setModified(False)
+            self.__loadingDocument = None
+            self.__contentBox.setPlaceholderText('Content')
+
+    def applyNoteEvent(self, event):
+        # Changes made elsewhere to the open note, the ones made here are in it already. A change is only taken
+        # over where this screen has nothing unsaved of its own.
+        if not self.isVisible() or self.__noteId is None or self.__loadingDocument is not None:
+            return
+        if isinstance(event, NoteRemoved):
+            if event.noteId == self.__noteId:
+                self.__noteRemoved()
+        elif isinstance(event, NotesReloaded) or isinstance(event, NoteChanged) and event.note[4] == self.__noteId:
+            self.__refresh()
+
+    def __refresh(self):
+        self.__stale = False
+        request = self.__request
+        revision = self.__contentBox.document().revision()
+        # the edits this screen has appended stay in the log, compacting the note on every change made elsewhere
+        # would rewrite the whole body
+        self.parent().getWorker().submit(self.parent().getProfile().read_note, self.__noteId, False,
+                                         callback=lambda note: self.__refreshNote(request, revision, note))
+
+    def __refreshNote(self, request, revision, note):
+        if request != self.__request or note is None or self.__noteId is None or not self.isVisible():
+            return
+        self.__date = note[2]
+        if self.__titleBox.text() == self.__title:
+            self.__title = note[0]
+            self.__titleBox.setText(self.__title)
+        if self.__getFavoriteButtonValue() == bool(self.__favorite):
+            self.__favorite = note[3]
+            if self.__favorite:
+                self.__favoriteButton.setText('added as favorite')
+            else:
+                self.__favoriteButton.setText('add as favorite')
+
+        document = self.__contentBox.document()
+        if self.__edits:
+            # the note is read again once they are appended to it, the two are one text then
+            self.__stale = True
+            return
+        if document.revision() != revision:
+            # typed while the note was read, and flushed already
+            self.__refresh()
+            return
+        if not self.__isAutosaving() and document.isModified() or note[1] == document.toPlainText():
+            return
+        position = self.__contentBox.textCursor().position()
+        scroll = self.__contentBox.verticalScrollBar().value()
+        self.__ignoreEdits = True
+        self.__contentBox.setPlainText(note[1])
+        self.__ignoreEdits = False
+        cursor = self.__contentBox.textCursor()
+        cursor.setPosition(min(position, document.characterCount() - 1))
+        self.__contentBox.setTextCursor(cursor)
+        self.__contentBox.verticalScrollBar().setValue(scroll)
+        document.setModified(False)
+
+    def __noteRemoved(self):
+        self.__discardEdits()
+        self.__noteId = None
+        QMessageBox.information(self, 'Note deleted', 'This note was deleted elsewhere, it is no longer saved.')
+        self.noteExited.emit()
+
+    def __noteMissing(self):
+        # deleted before it was loaded, or while its blocks were
+        self.__setLoading(False)
+        self.__noteId = None
+        QMessageBox.information(self, 'Note deleted', 'This note was deleted elsewhere.')
+        self.noteExited.emit()
+
+    def returnEvent(self):
+        retval = self.__showExitPopup('Go Back')
+
+        if retval == QMessageBox.Yes:
+            self.save(lambda saved: self.noteExited.emit() if saved else self.__showSaveErrorPopup())
+        elif retval == QMessageBox.No:
+            self.__finishAutosave()
+            self.noteExited.emit()
+
+    def closeEvent(self, a0: QtGui.QCloseEvent) -> None:
+        retval = self.__showExitPopup('Exit')
+
+        if retval == QMessageBox.Yes:
+            # the application is about to stop the worker, so wait for the save here
+            self.__discardEdits()
+            if self.parent().getWorker().call(self.parent().getProfile().update_note, *self.__saveArguments()):
+                a0.accept()
+            else:
+                self.__showSaveErrorPopup()
+        elif retval == QMessageBox.No:
+            self.__finishAutosave()
+            a0.accept()
+        else:
+            a0.ignore()
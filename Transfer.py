@@ -0,0 +1,132 @@
+import json
+import math
+import os
+import re
+from time import perf_counter, time
+
+# files read from a directory, and the extension of the files written to one
+NOTE_EXTENSIONS = ('.txt', '.md')
+EXPORT_EXTENSION = '.txt'
+# notes between two progress reports
+PROGRESS_INTERVAL = 500
+# characters that are not allowed in file names on one of the usual file systems
+UNSAFE_FILE_NAME = re.compile(r'[\x00-\x1f<>:"/\\|?*]')
+
+
+class TransferStats:
+    def __init__(self):
+        self.notes = 0
+        self.bytes = 0
+        self.__start = perf_counter()
+        self.__end = None
+
+    def elapsed(self):
+        return (perf_counter() if self.__end is None else self.__end) - self.__start
+
+    def finish(self):
+        self.__end = perf_counter()
+
+    def __str__(self):
+        elapsed = max(self.elapsed(), 1e-9)
+        return '%d notes, %.1f MB in %.2f s (%.0f notes/s, %.1f MB/s)' % (
+            self.notes, self.bytes / 1e6, elapsed, self.notes / elapsed, self.bytes / 1e6 / elapsed)
+
+
+def counted(notes, stats, progress=None, interval=PROGRESS_INTERVAL):
+    for note in notes:
+        stats.notes += 1
+        stats.bytes += len(note[1].encode('utf-8'))
+        yield note
+        if progress is not None and stats.notes % interval == 0:
+            progress(stats)
+
+
+def is_archive(path):
+    return path.lower().endswith('.jsonl')
+
+
+def read_directory(path):
+    # the .txt and .md files in path, titled by their names and dated by their modification times
+    for entry in sorted(os.scandir(path), key=lambda entry: entry.name):
+        title, extension = os.path.splitext(entry.name)
+        if extension.lower() in NOTE_EXTENSIONS and title and not title.startswith('.') and entry.is_file():
+            with open(entry.path, encoding='utf-8', errors='replace') as file:
+                yield title, file.read(), entry.stat().st_mtime, False
+
+
+def archive_date(value, number):
+    # a missing or null date is the time of the import, anything but a finite number of seconds is an error
+    if value is None:
+        return time()
+    try:
+        date = float(value)
+    except (TypeError, ValueError):
+        date = None
+    if isinstance(value, bool) or date is None or not math.isfinite(date):
+        raise ValueError('line %d: the date %r is not a number of seconds' % (number, value))
+    return date
+
+
+def read_archive(path):
+    # one JSON object per line with title, content, date and favorite, only the title is required
+    with open(path, encoding='utf-8') as file:
+        for number, line in enumerate(file, 1):
+            if line.strip():
+                note = json.loads(line)
+                yield note['title'], note.get('content', ''), archive_date(note.get('date'), number), \
+                    bool(note.get('favorite'))
+
+
+def file_name(title, used):
+    # a file name for title that is safe everywhere and not in used, which holds lower case names
+    base = UNSAFE_FILE_NAME.sub('_', title).strip(' .') or 'Note'
+    name = base
+    suffix = 1
+    while (name + EXPORT_EXTENSION).lower() in used:
+        suffix += 1
+        name = '%s (%d)' % (base, suffix)
+    used.add((name + EXPORT_EXTENSION).lower())
+    return name + EXPORT_EXTENSION
+
+
+def write_directory(path, notes):
+    # one file per note, favorites are not kept, files already in path are not overwritten
+    os.makedirs(path, exist_ok=True)
+    used = {name.lower() for name in os.listdir(path)}
+    for title, content, date, favorite in notes:
+        note_path = os.path.join(path, file_name(title, used))
+        with open(note_path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        os.utime(note_path, (date, date))
+
+
+def write_archive(path, notes):
+    with open(path, 'w', encoding='utf-8') as file:
+        write_lines(file, notes)
+
+
+def write_lines(file, notes):
+    # the JSONL of an archive, written to an open text file one note at a time
+    for title, content, date, favorite in notes:
+        file.write(json.dumps({'title': title, 'content': content, 'date': date, 'favorite': bool(favorite)},
+                              ensure_ascii=False))
+        file.write('\n')
+
+
+def import_notes(profile, path, progress=None):
+    # Imports a JSONL archive or a directory of text files into profile. The notes are read while they are
+    # inserted, only a batch of them is in memory at a time. Returns the TransferStats.
+    stats = TransferStats()
+    notes = read_archive(path) if is_archive(path) else read_directory(path)
+    profile.import_notes(counted(notes, stats, progress))
+    stats.finish()
+    return stats
+
+
+def export_notes(profile, path, progress=None):
+    # writes the notes of profile to a JSONL archive when path ends in .jsonl, to a directory otherwise
+    stats = TransferStats()
+    write = write_archive if is_archive(path) else write_directory
+    write(path, counted(profile.export_notes(), stats, progress))
+    stats.finish()
+    return stats
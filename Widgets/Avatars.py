@@ -0,0 +1,48 @@
+from PyQt5.QtCore import Qt, QBuffer, QByteArray, QIODevice, QRect
+from PyQt5.QtGui import QImage, QPixmap
+
+from Cache import LRUCache
+from Widgets.PixmapCache import pixmapBytes
+
+# side of the square thumbnails profile pictures are stored as, enough for the widest button at a ratio of 2
+AVATAR_SIZE = 192
+AVATAR_QUALITY = 85
+# a decoded 192x192 picture takes 144 KiB
+AVATAR_CACHE_ENTRIES = 128
+AVATAR_CACHE_BYTES = 8 * 1024 * 1024
+
+# decoded pictures by their stored bytes, the login screen is rebuilt on every reload and only decodes new ones
+avatarCache = LRUCache(AVATAR_CACHE_ENTRIES, AVATAR_CACHE_BYTES, pixmapBytes)
+
+
+def thumbnail(path, size=AVATAR_SIZE):
+    # The picture at path cropped to a square and scaled to size, as JPEG or as PNG when it has transparency.
+    # None when path is not a picture. Only uses QImage, it can run outside the GUI thread.
+    image = QImage(path)
+    if image.isNull():
+        return None
+    image = image.scaled(size, size, Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation)
+    image = image.copy(QRect((image.width() - size) // 2, (image.height() - size) // 2, size, size))
+
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    if image.hasAlphaChannel():
+        image.save(buffer, 'PNG')
+    else:
+        image.save(buffer, 'JPEG', AVATAR_QUALITY)
+    buffer.close()
+    return bytes(data)
+
+
+def avatarPixmap(icon):
+    # the picture stored as icon, None for a profile without one
+    if icon is None:
+        return None
+    pixmap = avatarCache.get(icon)
+    if pixmap is None:
+        pixmap = QPixmap()
+        if not pixmap.loadFromData(icon):
+            return None
+        avatarCache.put(icon, pixmap)
+    return pixmap
@@ -1,3 +1,4 @@
+from functools import lru_cache
 from typing import Tuple
 
 from PyQt5 import QtGui
@@ -5,6 +6,16 @@ from PyQt5.QtCore import QPoint, QRect, Qt
 from PyQt5.QtGui import QPainter, QColor
 from PyQt5.QtWidgets import QWidget, QSizePolicy, QLabel, QAbstractButton, QGridLayout, QPushButton, QLineEdit
 
+from Widgets.PixmapCache import cachedPixmap
+
+
+@lru_cache(maxsize=256)
+def profileButtonSize(width, count=1, spacing=0):
+    # A tenth of width wide and half again as high, narrower when count buttons with spacing between them would not
+    # fit in width. Wider buttons would widen the window, which would widen the buttons again.
+    buttonWidth = max(min(width // 10, (width - spacing * (count - 1)) // count), 1)
+    return buttonWidth, buttonWidth * 3 // 2
+
 
 class ProfileButton(QAbstractButton):
     def __init__(self, parent: QWidget, name='', image=None):
@@ -13,71 +24,79 @@ class ProfileButton(QAbstractButton):
         self.name = name
         self.setSizePolicy(QSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed))
         size = self.parent().frameGeometry()
-        self.setFixedSize(size.width() / 4, size.height() / 4)
+        self.setFixedSize(size.width() // 4, size.height() // 4)
 
     def paintEvent(self, e: QtGui.QPaintEvent) -> None:
-        painter = QPainter(self)
-        if self.underMouse():
+        # a button is drawn once for every look it has, after that painting is a copy
+        hover = self.underMouse()
+        ratio = self.devicePixelRatioF()
+        key = (type(self).__name__, self.width(), self.height(), ratio, hover, self.font().key()) + self.renderKey()
+        pixmap = cachedPixmap(key, self.size(), ratio, self.font(),
+                              lambda painter, rect: self.renderButton(painter, rect, hover))
+        QPainter(self).drawPixmap(0, 0, pixmap)
+
+    def renderKey(self):
+        # what the look depends on besides the size, the hover state and the font
+        return ()
+
+    def renderButton(self, painter: QPainter, rect: QRect, hover: bool) -> None:
+        if hover:
             painter.setBrush(QColor(150, 150, 150))
             painter.setPen(QColor(150, 150, 150))
         else:
             painter.setBrush(QColor(200, 200, 200))
             painter.setPen(QColor(200, 200, 200))
-        painter.drawRect(e.rect())
-
-    def updateGeometry(self) -> None:
-        size = self.parent().frameGeometry()
-        height = size.height() / 2
-        self.setFixedWidth(int(size.width() / 10))
-        if (self.width() / 2) * 3 != height:
-            self.setFixedHeight(int((self.width() / 2) * 3))
+        painter.drawRect(rect)
 
 
 class ProfileCreateButton(ProfileButton):
     def __init__(self, parent):
         super().__init__(parent)
 
-    def paintEvent(self, e: QtGui.QPaintEvent) -> None:
-        super().paintEvent(e)
-        painter = QPainter(self)
+    def renderButton(self, painter: QPainter, rect: QRect, hover: bool) -> None:
+        super().renderButton(painter, rect, hover)
         painter.setBrush(QColor(255, 255, 255))
         painter.setPen(QColor(255, 255, 255))
-        size = self.frameGeometry()
-        painter.drawRect(QRect((size.width()) / 2 - 5, (size.height()) / 2 - 25, 10, 50))  # vertical line
-        painter.drawRect(QRect((size.width()) / 2 - 25, (size.height()) / 2 - 5, 50, 10))  # horizontal line
+        painter.drawRect(QRect(rect.width() // 2 - 5, rect.height() // 2 - 25, 10, 50))  # vertical line
+        painter.drawRect(QRect(rect.width() // 2 - 25, rect.height() // 2 - 5, 50, 10))  # horizontal line
 
 
 class ProfileLoginButton(ProfileButton):
     def __init__(self, parent, name, image=None):
         super().__init__(parent, name, image)
 
-    def paintEvent(self, e: QtGui.QPaintEvent) -> None:
-        super().paintEvent(e)
-        painter = QPainter(self)
-        size = self.frameGeometry()
+    def renderKey(self):
+        return self.name, None if self.pixmap is None else self.pixmap.cacheKey()
+
+    def renderButton(self, painter: QPainter, rect: QRect, hover: bool) -> None:
+        super().renderButton(painter, rect, hover)
         font = painter.font()
 
         painter.setBrush(QColor(255, 255, 255))
         painter.setPen(QColor(255, 255, 255))
-        profile_background = QRect((size.width() / 8) / 2, (size.height() / 7) / 2, size.width() - (size.width() / 8),
-                                   size.width() - (size.height() / 7))
+        profile_background = QRect((rect.width() // 8) // 2, (rect.height() // 7) // 2,
+                                   rect.width() - (rect.width() // 8), rect.width() - (rect.height() // 7))
         painter.drawRect(profile_background)
-        label_background = QRect(profile_background.bottomLeft() + QPoint(0, (size.height() / 7) / 2),
-                                 QPoint(profile_background.right(), size.height() - (size.height() / 7) / 2))
+        label_background = QRect(profile_background.bottomLeft() + QPoint(0, (rect.height() // 7) // 2),
+                                 QPoint(profile_background.right(), rect.height() - (rect.height() // 7) // 2))
         painter.drawRect(label_background)
 
         painter.setPen(QColor(0, 0, 0))
-        font.setPointSizeF((label_background.width() / 7))
+        font.setPointSizeF(max(label_background.width() / 7, 1))
         painter.setFont(font)
         painter.drawText(label_background, Qt.AlignVCenter | Qt.AlignHCenter, self.name)
 
         if self.pixmap is None:
             profile_background.adjust(5, 5, -5, -5)
-            font.setPointSizeF(profile_background.width() - 30)
+            font.setPointSizeF(max(profile_background.width() - 30, 1))
             painter.setFont(font)
             painter.drawText(profile_background, Qt.AlignVCenter | Qt.AlignHCenter, self.name[0].upper())
         else:
-            painter.drawPixmap(e.rect(), self.pixmap)
+            # fitted into the middle of the area, which is seldom square, instead of stretched over it
+            target = QRect(QPoint(), self.pixmap.size().scaled(profile_background.size(), Qt.KeepAspectRatio))
+            target.moveCenter(profile_background.center())
+            painter.setRenderHint(QPainter.SmoothPixmapTransform)
+            painter.drawPixmap(target, self.pixmap)
 
 
 class LoginLineEdit(QLineEdit):
@@ -126,8 +145,8 @@ class Popup(QWidget):
         font.setPointSizeF(self.size().width() / 7)
         self.setFont(font)
         self.__initUI(title, widget)
-        self.move((self.parent().size().width() - self.size().width()) / 2,
-                  (self.parent().size().height() - self.size().height()) / 2)
+        self.move((self.parent().size().width() - self.size().width()) // 2,
+                  (self.parent().size().height() - self.size().height()) // 2)
 
     def __initUI(self, title, widget: Tuple[QWidget]):
         label = QLabel(self)
@@ -198,10 +217,15 @@ class ProfileCreatePopup(Popup):
     def create_profile(self):
         if self.check_password():
             login_window = self.parent().parent()
-            if login_window.create_profile(self.name.text(), self.password.text()):
-                self.hide()
-            else:
-                self.error_name()
+            self.create_profile_button.setEnabled(False)
+            login_window.create_profile(self.name.text(), self.password.text(), self.profile_created)
+
+    def profile_created(self, created):
+        self.create_profile_button.setEnabled(True)
+        if created:
+            self.hide()
+        else:
+            self.error_name()
 
     def error_name(self):
         self.name.showError()
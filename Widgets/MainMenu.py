@@ -1,7 +1,10 @@
 from PyQt5 import QtGui
-from PyQt5.QtCore import QRect, Qt, QSize, QPoint
+from PyQt5.QtCore import QRect, Qt, QSize, QPoint, QAbstractListModel, QModelIndex
 from PyQt5.QtGui import QPainter, QColor
-from PyQt5.QtWidgets import QAbstractButton, QSizePolicy, QMenu, QMessageBox, QVBoxLayout, QLabel
+from PyQt5.QtWidgets import QAbstractButton, QSizePolicy, QMenu, QMessageBox, QListView, QStyledItemDelegate, \
+    QStyleOptionViewItem, QStyle, QAbstractItemView, QFrame
+
+from Widgets.PixmapCache import cachedPixmap
 
 
 class NoteButton(QAbstractButton):
@@ -11,15 +14,21 @@ class NoteButton(QAbstractButton):
         self.setFixedSize(160, 240)
 
     def paintEvent(self, e: QtGui.QPaintEvent) -> None:
-        painter = QPainter()
-        painter.begin(self)
-        if not self.underMouse():
+        hover = self.underMouse()
+        ratio = self.devicePixelRatioF()
+        key = (type(self).__name__, self.width(), self.height(), ratio, hover)
+        pixmap = cachedPixmap(key, self.size(), ratio, self.font(),
+                              lambda painter, rect: self.renderButton(painter, rect, hover))
+        QPainter(self).drawPixmap(0, 0, pixmap)
+
+    def renderButton(self, painter: QPainter, rect: QRect, hover: bool) -> None:
+        if not hover:
             painter.setBrush(QColor(200, 200, 200))
             painter.setPen(QColor(200, 200, 200))
         else:
             painter.setBrush(QColor(150, 150, 150))
             painter.setPen(QColor(150, 150, 150))
-        painter.drawRect(e.rect())
+        painter.drawRect(rect)
 
 
 class CreateNoteButton(NoteButton):
@@ -30,76 +39,222 @@ class CreateNoteButton(NoteButton):
     def __createNote(self):
         self.parent().noteCreated.emit()
 
-    def paintEvent(self, e: QtGui.QPaintEvent) -> None:
-        super().paintEvent(e)
-        painter = QPainter()
-        painter.begin(self)
+    def renderButton(self, painter: QPainter, rect: QRect, hover: bool) -> None:
+        super().renderButton(painter, rect, hover)
         painter.setBrush(QColor(255, 255, 255))
         painter.setPen(QColor(255, 255, 255))
-        center = e.rect().center()
+        center = rect.center()
         rect1 = QRect(center, QSize(70, 10))
-        rect1.moveTo(center-QPoint(rect1.width()/2, rect1.height()/2))
+        rect1.moveTo(center - QPoint(rect1.width() // 2, rect1.height() // 2))
         rect2 = QRect(center, QSize(10, 70))
-        rect2.moveTo(center-QPoint(rect2.width()/2, rect2.height()/2))
+        rect2.moveTo(center - QPoint(rect2.width() // 2, rect2.height() // 2))
         painter.drawRect(rect1)
         painter.drawRect(rect2)
 
 
-class OpenNoteButton(NoteButton):
-    def __init__(self, parent, title, favorite: bool = False):
+NOTE_CARD_SIZE = QSize(160, 240)
+NOTE_CARD_SPACING = 10
+
+TitleRole = Qt.DisplayRole
+PreviewRole = Qt.UserRole
+DateRole = Qt.UserRole + 1
+FavoriteRole = Qt.UserRole + 2
+IdRole = Qt.UserRole + 3
+
+
+class NoteListModel(QAbstractListModel):
+    # Holds the notes loaded so far. With a fetcher, more are asked for when the view reaches the end: it is called
+    # with the key of the next page and a callback taking the (notes, next key) of the page, next key None after
+    # the last one.
+    def __init__(self, parent=None, fetcher=None):
         super().__init__(parent)
-        self.__title = title
-        self.__favorite = favorite
-        self.__contextMenu = self.__createContextMenu()
-        self.setContextMenuPolicy(Qt.CustomContextMenu)
-        self.customContextMenuRequested.connect(lambda point: self.__contextMenu.exec_(self.mapToGlobal(point)))
-        self.clicked.connect(self.__openNote)
+        self.__notes = []
+        self.__fetcher = fetcher
+        self.__after = None
+        self.__fetching = False
+        # pages requested before the last reset are dropped when they arrive
+        self.__generation = 0
 
-        self.initUI()
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self.__notes)
 
-    def initUI(self):
-        profile = self.parent().parent().getProfile()
-        note = profile.read_note(self.__title)
-        title = QLabel(self.__title)
-        content = QLabel(note[1])
-        layout = QVBoxLayout()
-        layout.setAlignment(Qt.AlignTop | Qt.AlignLeft)
-        layout.addWidget(title)
-        layout.addWidget(content)
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
 
-        layout.addLayout(layout)
-        self.setLayout(layout)
+        note = self.__notes[index.row()]
+        if role == TitleRole:
+            return note[0]
+        elif role == PreviewRole:
+            return note[1]
+        elif role == DateRole:
+            return note[2]
+        elif role == FavoriteRole:
+            return bool(note[3])
+        elif role == IdRole:
+            return note[4]
+        return None
 
-    def __createContextMenu(self):
-        menu = QMenu(self)
-        menu.addAction('Open', self.__openNote)
-        menu.addAction('Delete', self.__deleteNote)
-        menu.addSeparator()
-        if self.__favorite:
-            menu.addAction('Remove as favorite', self.__removeToFavorite)
+    def setNotes(self, notes, after=None):
+        self.beginResetModel()
+        self.__notes = list(notes)
+        self.__after = after
+        self.__fetching = False
+        self.__generation += 1
+        self.endResetModel()
+
+    def canFetchMore(self, parent: QModelIndex = QModelIndex()) -> bool:
+        return not parent.isValid() and self.__after is not None and self.__fetcher is not None
+
+    def fetchMore(self, parent: QModelIndex = QModelIndex()) -> None:
+        if self.__fetching or not self.canFetchMore(parent):
+            return
+        self.__fetching = True
+        generation = self.__generation
+        self.__fetcher(self.__after, lambda page: self.__addPage(generation, page))
+
+    def __addPage(self, generation, page):
+        if generation != self.__generation:
+            return
+        notes, self.__after = page
+        self.__fetching = False
+        if notes:
+            self.beginInsertRows(QModelIndex(), len(self.__notes), len(self.__notes) + len(notes) - 1)
+            self.__notes.extend(notes)
+            self.endInsertRows()
+
+    def findRow(self, noteId) -> int:
+        for row, note in enumerate(self.__notes):
+            if note[4] == noteId:
+                return row
+        return -1
+
+    def insertNote(self, note):
+        # notes are kept in (date, id) order, the order of the pages, and new ones usually belong at the end. Past
+        # the pages that are not loaded yet the note is left for its page to bring in.
+        key = (note[2], note[4])
+        if self.__after is not None and key > self.__after:
+            return
+        row = len(self.__notes)
+        while row > 0 and (self.__notes[row - 1][2], self.__notes[row - 1][4]) > key:
+            row -= 1
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.__notes.insert(row, note)
+        self.endInsertRows()
+
+    def removeNote(self, noteId) -> bool:
+        row = self.findRow(noteId)
+        if row == -1:
+            return False
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.__notes[row]
+        self.endRemoveRows()
+        return True
+
+    def updateNote(self, note) -> bool:
+        row = self.findRow(note[4])
+        if row == -1:
+            return False
+        self.__notes[row] = note
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
+        return True
+
+
+class NoteCardDelegate(QStyledItemDelegate):
+    def sizeHint(self, option: QStyleOptionViewItem, index: QModelIndex) -> QSize:
+        return NOTE_CARD_SIZE
+
+    def paint(self, painter: QPainter, option: QStyleOptionViewItem, index: QModelIndex) -> None:
+        # cards are rendered once for each look, scrolling and hovering only copy them
+        hover = bool(option.state & QStyle.State_MouseOver)
+        ratio = painter.device().devicePixelRatioF()
+        title = index.data(TitleRole)
+        preview = index.data(PreviewRole)
+        key = ('NoteCard', option.rect.width(), option.rect.height(), ratio, hover, option.font.key(), title, preview)
+        # one pixel more each way for the outline the pen draws around the card
+        pixmap = cachedPixmap(key, option.rect.size() + QSize(1, 1), ratio, option.font,
+                              lambda cardPainter, rect: self.renderCard(cardPainter, rect.adjusted(0, 0, -1, -1),
+                                                                        hover, title, preview))
+        painter.drawPixmap(option.rect.topLeft(), pixmap)
+
+    def renderCard(self, painter: QPainter, rect: QRect, hover: bool, title: str, content: str) -> None:
+        if hover:
+            painter.setBrush(QColor(150, 150, 150))
+            painter.setPen(QColor(150, 150, 150))
         else:
-            menu.addAction('Add as favorite', self.__addToFavorite)
+            painter.setBrush(QColor(200, 200, 200))
+            painter.setPen(QColor(200, 200, 200))
+        painter.drawRect(rect)
+
+        painter.setPen(QColor(0, 0, 0))
+        textRect = rect.adjusted(10, 10, -10, -10)
+        metrics = painter.fontMetrics()
+        title = metrics.elidedText(title, Qt.ElideRight, textRect.width())
+        painter.drawText(textRect, Qt.AlignTop | Qt.AlignLeft, title)
+
+        textRect.setTop(textRect.top() + metrics.height() + 5)
+        painter.drawText(textRect, Qt.AlignTop | Qt.AlignLeft | Qt.TextWordWrap, content)
+
 
-        return menu
+class NoteListView(QListView):
+    def __init__(self, parent, model: NoteListModel):
+        super().__init__(parent)
+        self.setModel(model)
+        self.setItemDelegate(NoteCardDelegate(self))
+        self.setFlow(QListView.LeftToRight)
+        self.setWrapping(False)
+        self.setUniformItemSizes(True)
+        self.setSpacing(NOTE_CARD_SPACING // 2)
+        self.setHorizontalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setSelectionMode(QAbstractItemView.NoSelection)
+        self.setFocusPolicy(Qt.NoFocus)
+        self.setFrameShape(QFrame.NoFrame)
+        self.viewport().setAutoFillBackground(False)
+        self.setMouseTracking(True)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+        scrollBarHeight = self.horizontalScrollBar().sizeHint().height()
+        self.setFixedHeight(NOTE_CARD_SIZE.height() + NOTE_CARD_SPACING + scrollBarHeight)
 
-    def __addToFavorite(self):
-        self.parent().noteFavorited.emit(self.__title, True)
+        self.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.customContextMenuRequested.connect(self.__showContextMenu)
+        self.clicked.connect(lambda index: self.__openNote(index.data(IdRole)))
+        # QListView only fetches once the end is in view, the next page is asked for a screen ahead of it
+        self.horizontalScrollBar().valueChanged.connect(self.__prefetch)
 
-    def __removeToFavorite(self):
-        self.parent().noteFavorited.emit(self.__title, False)
+    def __prefetch(self, value):
+        scrollBar = self.horizontalScrollBar()
+        if scrollBar.maximum() - value <= self.viewport().width() and self.model().canFetchMore():
+            self.model().fetchMore()
 
-    def __openNote(self):
-        self.parent().noteOpened.emit(self.__title)
+    def __showContextMenu(self, point: QPoint):
+        index = self.indexAt(point)
+        if not index.isValid():
+            return
 
-    def __deleteNote(self):
+        noteId = index.data(IdRole)
+        title = index.data(TitleRole)
+        menu = QMenu(self)
+        menu.addAction('Open', lambda: self.__openNote(noteId))
+        menu.addAction('Delete', lambda: self.__deleteNote(noteId, title))
+        menu.addSeparator()
+        if index.data(FavoriteRole):
+            menu.addAction('Remove as favorite', lambda: self.parent().noteFavorited.emit(noteId, False))
+        else:
+            menu.addAction('Add as favorite', lambda: self.parent().noteFavorited.emit(noteId, True))
+        menu.exec_(self.viewport().mapToGlobal(point))
+
+    def __openNote(self, noteId):
+        self.parent().noteOpened.emit(noteId)
+
+    def __deleteNote(self, noteId, title):
         message = QMessageBox(self)
-        message.setWindowTitle('Delete ' + self.__title)
+        message.setWindowTitle('Delete ' + title)
         message.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
         message.setText('Are you sure you want to delete this note?')
         retval = message.exec_()
 
         if retval == QMessageBox.Yes:
-            self.parent().noteDeleted.emit(self.__title)
-
-    def paintEvent(self, e: QtGui.QPaintEvent) -> None:
-        super().paintEvent(e)
+            self.parent().noteDeleted.emit(noteId)
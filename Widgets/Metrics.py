@@ -0,0 +1,106 @@
+from datetime import datetime
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QCheckBox, QTableWidget, QTableWidgetItem, \
+    QPushButton, QLabel, QFileDialog, QHeaderView, QAbstractItemView
+
+STATEMENT_COLUMNS = ['Statement', 'Calls', 'Total ms', 'Mean ms', 'p95 ms', 'Max ms', 'Rows', 'Changes']
+STATEMENT_KEYS = ['calls', 'total_ms', 'mean_ms', 'p95_ms', 'max_ms', 'rows', 'changes']
+SLOW_QUERY_COLUMNS = ['Time', 'Statement', 'ms', 'Rows']
+
+
+def createTable(columns):
+    table = QTableWidget(0, len(columns))
+    table.setHorizontalHeaderLabels(columns)
+    table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+    table.verticalHeader().hide()
+    table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+    table.horizontalHeader().setStretchLastSection(True)
+    return table
+
+
+def createItem(value):
+    if isinstance(value, float):
+        item = QTableWidgetItem('%.3f' % value)
+    else:
+        item = QTableWidgetItem(str(value))
+    if not isinstance(value, str):
+        item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+    return item
+
+
+class QueryMetricsDialog(QDialog):
+    # Shows the statement metrics of the worker's database, the worker thread and its readers record into the same
+    # metrics.
+    def __init__(self, parent, worker):
+        super().__init__(parent)
+        self.setWindowTitle('Query metrics')
+        self.resize(800, 500)
+        self.__worker = worker
+        self.__recordBox = QCheckBox('Record statements', self)
+        self.__recordBox.toggled.connect(self.__setRecording)
+        self.__statements = createTable(STATEMENT_COLUMNS)
+        self.__slowQueries = createTable(SLOW_QUERY_COLUMNS)
+        self.__slowLabel = QLabel('Slow queries')
+
+        refreshButton = QPushButton('Refresh', self)
+        refreshButton.clicked.connect(self.refresh)
+        resetButton = QPushButton('Reset', self)
+        resetButton.clicked.connect(self.__reset)
+        exportButton = QPushButton('Export...', self)
+        exportButton.clicked.connect(self.__export)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.__recordBox)
+        buttons.addStretch()
+        buttons.addWidget(refreshButton)
+        buttons.addWidget(resetButton)
+        buttons.addWidget(exportButton)
+
+        layout = QVBoxLayout()
+        layout.addLayout(buttons)
+        layout.addWidget(self.__statements, 2)
+        layout.addWidget(self.__slowLabel)
+        layout.addWidget(self.__slowQueries, 1)
+        self.setLayout(layout)
+
+    def showEvent(self, e) -> None:
+        super().showEvent(e)
+        self.refresh()
+
+    def refresh(self):
+        database = self.__worker.database
+        self.__worker.submit(lambda: (database.is_instrumented(), database.get_metrics()), callback=self.__showMetrics)
+
+    def __setRecording(self, record):
+        self.__worker.submit(self.__worker.database.set_instrumented, record)
+
+    def __reset(self):
+        self.__worker.submit(self.__worker.database.reset_metrics, callback=lambda _: self.refresh())
+
+    def __export(self):
+        path, _ = QFileDialog.getSaveFileName(self, 'Export query metrics', 'metrics.json', 'JSON (*.json)')
+        if path:
+            self.__worker.submit(self.__worker.database.export_metrics, path)
+
+    def __showMetrics(self, result):
+        recording, metrics = result
+        self.__recordBox.blockSignals(True)
+        self.__recordBox.setChecked(recording)
+        self.__recordBox.blockSignals(False)
+
+        statements = sorted(metrics['statements'].items(), key=lambda item: item[1]['total_ms'], reverse=True)
+        self.__statements.setRowCount(len(statements))
+        for row, (name, stats) in enumerate(statements):
+            self.__statements.setItem(row, 0, createItem(name))
+            for column, key in enumerate(STATEMENT_KEYS, 1):
+                self.__statements.setItem(row, column, createItem(stats[key]))
+
+        self.__slowLabel.setText('Slow queries (%g ms or longer)' % metrics['slow_query_ms'])
+        slowQueries = metrics['slow_queries'][::-1]
+        self.__slowQueries.setRowCount(len(slowQueries))
+        for row, query in enumerate(slowQueries):
+            self.__slowQueries.setItem(row, 0, createItem(datetime.fromtimestamp(query['time']).strftime('%H:%M:%S')))
+            self.__slowQueries.setItem(row, 1, createItem(query['statement']))
+            self.__slowQueries.setItem(row, 2, createItem(query['ms']))
+            self.__slowQueries.setItem(row, 3, createItem(query['rows']))
@@ -0,0 +1,32 @@
+from PyQt5.QtCore import Qt, QRect, QPoint
+from PyQt5.QtGui import QPainter, QPixmap
+
+from Cache import LRUCache
+
+# a 160x240 note card takes 150 KiB at a device pixel ratio of 1
+PIXMAP_CACHE_ENTRIES = 512
+PIXMAP_CACHE_BYTES = 24 * 1024 * 1024
+
+
+def pixmapBytes(pixmap):
+    return pixmap.width() * pixmap.height() * pixmap.depth() // 8
+
+
+# rendered widgets and cards by everything their look depends on, shared by every widget of the GUI thread
+pixmapCache = LRUCache(PIXMAP_CACHE_ENTRIES, PIXMAP_CACHE_BYTES, pixmapBytes)
+
+
+def cachedPixmap(key, size, ratio, font, render):
+    # The pixmap render drew for key, render is only called when the cache does not have it. It gets a painter
+    # using font on a transparent pixmap of size at the device pixel ratio ratio and the rect to fill.
+    pixmap = pixmapCache.get(key)
+    if pixmap is None:
+        pixmap = QPixmap(size * ratio)
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        painter.setFont(font)
+        render(painter, QRect(QPoint(0, 0), size))
+        painter.end()
+        pixmapCache.put(key, pixmap)
+    return pixmap
@@ -0,0 +1,29 @@
+from PyQt5.QtCore import QObject, QTimer
+
+# milliseconds between two geometry updates while the window is being resized
+FRAME_INTERVAL = 16
+
+
+class ResizeCoordinator(QObject):
+    # Coalesces the resize events of window into at most one call of update per frame, dragging the window edge
+    # sends many more. The size the window ends at is always applied, a size update already ran for is skipped.
+    def __init__(self, window, update, interval=FRAME_INTERVAL):
+        super().__init__(window)
+        self.__window = window
+        self.__update = update
+        self.__applied = None
+        self.__timer = QTimer(self)
+        self.__timer.setSingleShot(True)
+        self.__timer.setInterval(interval)
+        self.__timer.timeout.connect(self.__apply)
+
+    def resized(self):
+        # the timer is not restarted, a long drag still gets an update every frame
+        if not self.__timer.isActive():
+            self.__timer.start()
+
+    def __apply(self):
+        size = self.__window.size()
+        if size != self.__applied:
+            self.__applied = size
+            self.__update()
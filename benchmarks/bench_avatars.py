@@ -0,0 +1,113 @@
+# Time until the login screen has a button for every profile when every profile has a picture, the first time and
+# on the reloads after it, against decoding the full pictures on every reload. The pictures are generated photos of
+# --picture pixels, stored once as thumbnails; the real NoteApp runs offscreen against a generated Notes.db.
+#
+#   python benchmarks/bench_avatars.py [--profiles 40] [--picture 3000x2000] [--reloads 10]
+
+import argparse
+import os
+import statistics
+import tempfile
+from time import perf_counter
+
+import common  # noqa: F401, puts the repository on sys.path
+
+from PyQt5.QtGui import QImage, QPainter, QColor, QLinearGradient, QPixmap
+from PyQt5.QtWidgets import QApplication
+
+from Database import Database
+
+
+def picture(path, width, height, seed):
+    image = QImage(width, height, QImage.Format_RGB32)
+    painter = QPainter(image)
+    gradient = QLinearGradient(0, 0, width, height)
+    gradient.setColorAt(0, QColor.fromHsv(seed * 37 % 360, 200, 220))
+    gradient.setColorAt(1, QColor.fromHsv(seed * 91 % 360, 120, 80))
+    painter.fillRect(image.rect(), gradient)
+    painter.end()
+    image.save(path, 'JPEG', 90)
+
+
+def fill(path, directory, profiles, width, height):
+    from Widgets.Avatars import thumbnail
+
+    database = Database(path)
+    pictures = []
+    start = perf_counter()
+    for i in range(profiles):
+        name = 'Profile' + str(i)
+        pictures.append(os.path.join(directory, name + '.jpg'))
+        picture(pictures[-1], width, height, i)
+        database.create_profile(name, 'password')
+    generated = perf_counter() - start
+    start = perf_counter()
+    stored = 0
+    for i, source in enumerate(pictures):
+        icon = thumbnail(source)
+        stored += len(icon)
+        database.set_profile_icon('Profile' + str(i), icon)
+    thumbnails = perf_counter() - start
+    database.closeDB()
+    print('%d pictures of %dx%d generated in %.0f ms, %.1f KiB on disk each' % (
+        profiles, width, height, generated * 1000, sum(os.path.getsize(p) for p in pictures) / profiles / 1024))
+    print('thumbnails made in %.1f ms each, %.1f KiB stored each' % (
+        thumbnails * 1000 / profiles, stored / profiles / 1024))
+    return pictures
+
+
+def reload(app, login):
+    start = perf_counter()
+    buttons = login.profile_buttons
+    login.reloadUI()
+    while login.profile_buttons is buttons:
+        app.processEvents()
+    app.processEvents()
+    return perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--profiles', type=int, default=40)
+    parser.add_argument('--picture', default='3000x2000')
+    parser.add_argument('--reloads', type=int, default=10)
+    args = parser.parse_args()
+    width, height = (int(side) for side in args.picture.split('x'))
+
+    with tempfile.TemporaryDirectory() as directory:
+        # NoteApp opens Notes.db in the working directory
+        os.chdir(directory)
+        app = QApplication([])
+        pictures = fill('Notes.db', directory, args.profiles, width, height)
+
+        from NoteApp import NoteApp
+        from Widgets.Avatars import avatarCache
+
+        window = NoteApp()
+        window.showNormal()
+        window.resize(1600, 900)
+        login = window.currentWidget()
+        while not login.profile_buttons:
+            app.processEvents()
+        app.processEvents()
+
+        avatarCache.clear()
+        first = reload(app, login)
+        times = [reload(app, login) for _ in range(args.reloads)]
+        print('login screen %8.1f ms first %8.1f ms median reload   %d KiB of decoded pictures' % (
+            first * 1000, statistics.median(times) * 1000, avatarCache.stats()['bytes'] // 1024))
+
+        # the full pictures decoded again for every reload, what drawing the originals would cost
+        times = []
+        for _ in range(args.reloads):
+            start = perf_counter()
+            pixmaps = [QPixmap(source) for source in pictures]
+            times.append(perf_counter() - start)
+        print('full pictures %7.1f ms median decode  %d KiB decoded' % (
+            statistics.median(times) * 1000, sum(p.width() * p.height() * p.depth() // 8 for p in pixmaps) // 1024))
+        del pixmaps
+        window.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+# Cost of noticing what another instance changed in a shared Notes.db: Profile.read_changes while nothing was
+# committed elsewhere, and after another connection changed a few notes, against reading the profile again the way
+# a reload would, all of its previews or the first page of each section. The statements every check runs are
+# counted on the polling connection.
+#
+#   python benchmarks/bench_changes.py [--notes 10000] [--polls 2000] [--runs 20]
+
+import argparse
+import os
+import statistics
+import tempfile
+from time import perf_counter
+
+from common import NAME, generate
+
+from Database import Database
+
+CHANGED = [1, 10, 100]
+
+
+def timed(function, runs, before=lambda: None):
+    times = []
+    for _ in range(runs):
+        before()
+        start = perf_counter()
+        function()
+        times.append(perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--notes', type=int, default=10000)
+    parser.add_argument('--polls', type=int, default=2000)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'Notes.db')
+        generate(path, args.notes)
+        # the other instance and the one that polls, each with its own connection
+        other = Database(path)
+        writer = other.open_profile(NAME)
+        database = Database(path)
+        profile = database.open_profile(NAME)
+        events = []
+        profile.add_listener(events.append)
+        statements = []
+        database.connection.set_trace_callback(statements.append)
+        profile.watch_changes()
+        noteIds = [note[4] for note in profile.read_note_page(False, limit=max(CHANGED))[0]]
+
+        statements.clear()
+        start = perf_counter()
+        for _ in range(args.polls):
+            profile.read_changes()
+        idle = (perf_counter() - start) / args.polls
+        print('%-28s %10.1f us   %.0f statements per poll' % ('poll, nothing changed', idle * 1e6,
+                                                              len(statements) / args.polls))
+
+        toggle = [False]
+
+        def change(count):
+            toggle[0] = not toggle[0]
+            writer.favorite_notes(noteIds[:count], toggle[0])
+            events.clear()
+            statements.clear()
+
+        for count in CHANGED:
+            elapsed = timed(profile.read_changes, args.runs, lambda: change(count))
+            print('%-28s %10.1f us   %d statements, %d events' % ('poll, %d notes changed' % count, elapsed * 1e6,
+                                                                  len(statements), len(events)))
+
+        statements.clear()
+        elapsed = timed(profile.reload, args.runs)
+        print('%-28s %10.1f us   %d notes' % ('reload, every preview', elapsed * 1e6, len(profile.get_notes())))
+        elapsed = timed(lambda: (profile.read_note_page(True), profile.read_note_page(False)), args.runs)
+        print('%-28s %10.1f us' % ('reload, first pages', elapsed * 1e6))
+        database.closeDB()
+        other.closeDB()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# Wall time of NoteCLI commands, each run as its own python -m NoteCLI process the way a batch job would run it,
+# against a generated profile. The same time for the GUI to show its first frame (main.py --startup-time) is the
+# comparison, and every command is checked not to import PyQt5.
+#
+#   python benchmarks/bench_cli.py [--notes 10000] [--runs 5]
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from time import perf_counter
+
+from common import NAME, ROOT, generate
+
+COMMANDS = [
+    ['stats'],
+    ['list', NAME, '--favorites'],
+    ['list', NAME],
+    ['search', NAME, 'meeting'],
+    ['export', NAME],
+]
+# run after a command in the same process, fails it when PyQt5 was imported
+NO_QT = 'import sys, NoteCLI; NoteCLI.main(sys.argv[1:]); ' \
+        'sys.exit("PyQt5 was imported" if "PyQt5" in sys.modules else 0)'
+
+
+def timed(arguments, runs):
+    times = []
+    for _ in range(runs):
+        start = perf_counter()
+        subprocess.run(arguments, cwd=ROOT, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--notes', type=int, default=10000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'Notes.db')
+        generate(path, args.notes)
+        print('%-32s %8.1f ms' % ('python -c pass', timed([sys.executable, '-c', 'pass'], args.runs) * 1000))
+        for command in COMMANDS:
+            arguments = ['--database', path] + command
+            subprocess.run([sys.executable, '-c', NO_QT] + arguments, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+            elapsed = timed([sys.executable, '-m', 'NoteCLI'] + arguments, args.runs)
+            print('%-32s %8.1f ms' % (' '.join(command), elapsed * 1000))
+
+        # the GUI against the same database, it opens Notes.db in the working directory
+        times = []
+        for _ in range(args.runs):
+            start = perf_counter()
+            subprocess.run([sys.executable, os.path.join(ROOT, 'main.py'), '--startup-time'], cwd=directory,
+                           check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            times.append(perf_counter() - start)
+        print('%-32s %8.1f ms' % ('main.py to first frame', statistics.median(times) * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+# Size of Notes.db and read / write throughput with the bodies stored as plain text and compressed with each codec,
+# plus the time compress_notes takes to compress a database written without a codec. The bodies are generated
+# prose and log lines, the kind of text that gets pasted into a note. The file sizes include the full text index,
+# which is not compressed.
+#
+#   python benchmarks/bench_compression.py [--notes 500] [--size 65536]
+
+import argparse
+import os
+import random
+import tempfile
+from time import perf_counter
+
+from common import NAME, WORDS
+
+from Database import Database, CODECS
+
+
+def body(size, seed):
+    generator = random.Random(seed)
+    lines = []
+    length = 0
+    while length < size:
+        if generator.random() < 0.3:
+            line = '2024-%02d-%02d %02d:%02d:%02d INFO worker-%d handled request %d in %d ms' % (
+                generator.randint(1, 12), generator.randint(1, 28), generator.randint(0, 23),
+                generator.randint(0, 59), generator.randint(0, 59), generator.randint(1, 8),
+                generator.randint(0, 10 ** 6), generator.randint(1, 900))
+        else:
+            line = ' '.join(generator.choices(WORDS, k=generator.randint(4, 16))).capitalize() + '.'
+        lines.append(line)
+        length += len(line) + 1
+    return '\n'.join(lines)[:size]
+
+
+def fill(database, bodies):
+    database.create_profile(NAME, 'password')
+    notes = database.create_notes(NAME, len(bodies))
+    start = perf_counter()
+    with database.transaction():
+        for (title, _, date, favorite, noteId), content in zip(notes, bodies):
+            database.update_note(NAME, noteId, title, content, favorite)
+    database.flush()
+    return perf_counter() - start, [note[4] for note in notes]
+
+
+def read(database, noteIds):
+    start = perf_counter()
+    for noteId in noteIds:
+        database.read_note(noteId, NAME)
+    return perf_counter() - start
+
+
+def stream(database, noteIds):
+    start = perf_counter()
+    for noteId in noteIds:
+        note = database.read_note_header(noteId, NAME)
+        offset = 0
+        while offset < note[4]:
+            _, offset = database.read_note_block(note[3], NAME, offset)
+    return perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--notes', type=int, default=500)
+    parser.add_argument('--size', type=int, default=64 * 1024)
+    args = parser.parse_args()
+
+    bodies = [body(args.size, seed) for seed in range(args.notes)]
+    megabytes = sum(len(content.encode('utf-8')) for content in bodies) / 1024 / 1024
+    print('%d notes, %.1f MB of text' % (args.notes, megabytes))
+
+    with tempfile.TemporaryDirectory() as directory:
+        plain = None
+        for codec in [None] + sorted(CODECS):
+            path = os.path.join(directory, '%s.db' % codec)
+            database = Database(path, codec=codec)
+            written, noteIds = fill(database, bodies)
+            read_time = read(database, noteIds)
+            stream_time = stream(database, noteIds)
+            database.cursor.execute('SELECT SUM(Size), SUM(length(CAST(Content AS BLOB))) FROM Notes')
+            text, stored = database.cursor.fetchone()
+            database.closeDB()
+            size = os.path.getsize(path) / 1024 / 1024
+            plain = plain or size
+            print('%-6s %5.2fx bodies %8.1f MB file (%.2fx) %7.1f MB/s write %7.1f MB/s read %7.1f MB/s stream' % (
+                codec, text / stored, size, plain / size, megabytes / written, megabytes / read_time,
+                megabytes / stream_time))
+
+            if codec is not None:
+                path = os.path.join(directory, 'migrated-%s.db' % codec)
+                database = Database(path, codec=None)
+                fill(database, bodies)
+                database.closeDB()
+                database = Database(path, codec=codec)
+                start = perf_counter()
+                compressed = database.compress_notes()
+                elapsed = perf_counter() - start
+                database.cursor.execute('VACUUM')
+                database.closeDB()
+                print('%-6s %8d notes compressed by compress_notes in %.3f s, %.1f MB after VACUUM' % (
+                    codec, compressed, elapsed, os.path.getsize(path) / 1024 / 1024))
+
+
+if __name__ == '__main__':
+    main()
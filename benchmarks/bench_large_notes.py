@@ -0,0 +1,93 @@
+# Open time, longest GUI stall and peak RSS for opening a large note into a QTextEdit: the old way (read_note and
+# setText) against the streamed one (read_note_header and read_note_block appended as plain text to a document that
+# is shown once complete, as NoteUI does). Every size and mode runs in its own offscreen process.
+#
+#   python benchmarks/bench_large_notes.py [size in MB ...]
+
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+from time import perf_counter
+
+from common import NAME
+
+from Database import Database, Profile
+
+TITLE = 'Large'
+
+
+def fill(path, size):
+    database = Database(path)
+    database.create_profile(NAME, 'password')
+    noteId = database.create_note(NAME, TITLE)
+    line = 'the quick brown fox jumps over the lazy dog 0123456789\n'
+    body = line * (size // len(line) + 1)
+    database.update_note(NAME, noteId, TITLE, body[:size], False)
+    database.closeDB()
+
+
+def measure(path, mode):
+    from PyQt5.QtGui import QTextCursor, QTextDocument
+    from PyQt5.QtWidgets import QApplication, QTextEdit
+
+    app = QApplication([])
+    editor = QTextEdit()
+    editor.resize(800, 600)
+    editor.show()
+    app.processEvents()
+
+    database = Database(path)
+    profile = Profile(database)
+    profile.init(NAME, 'password', 0)
+    noteId = database.read_note_previews(NAME)[0][4]
+
+    start = perf_counter()
+    stall = 0
+    if mode == 'before':
+        editor.setText(profile.read_note(noteId)[1])
+        app.processEvents()
+        stall = perf_counter() - start
+    else:
+        note = profile.read_note_header(noteId)
+        offset = 0
+        document = QTextDocument(editor)
+        document.setUndoRedoEnabled(False)
+        cursor = QTextCursor(document)
+        while offset < note[4]:
+            step = perf_counter()
+            text, offset = profile.read_note_block(note[3], offset)
+            cursor.movePosition(QTextCursor.End)
+            cursor.insertText(text)
+            app.processEvents()
+            stall = max(stall, perf_counter() - step)
+        step = perf_counter()
+        editor.setDocument(document)
+        app.processEvents()
+        stall = max(stall, perf_counter() - step)
+    elapsed = perf_counter() - start
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print('%-8s %10.3f s open %10.3f s longest stall %10.1f MB peak RSS' % (mode, elapsed, stall, peak))
+    database.closeDB()
+
+
+def main():
+    if sys.argv[1:2] == ['--measure']:
+        measure(sys.argv[2], sys.argv[3])
+        return
+
+    sizes = [float(arg) for arg in sys.argv[1:]] or [1, 5, 10, 50]
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            path = os.path.join(directory, 'Notes%s.db' % size)
+            fill(path, int(size * 1024 * 1024))
+            print('%s MB note' % size)
+            for mode in ('before', 'after'):
+                subprocess.run([sys.executable, os.path.abspath(__file__), '--measure', path, mode], check=True,
+                               stderr=subprocess.DEVNULL)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# Peak RSS of loading a profile of large notes the old way (every body through read_notes) and the current way
+# (previews through Profile.reload, a single body read when a note is opened). Each mode runs in its own process.
+#
+#   python benchmarks/bench_memory.py [--notes 1000] [--size 1048576]
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+from time import perf_counter, time
+
+from common import NAME
+
+from Database import Database, Profile, CREATE_NOTE, PREVIEW_LENGTH
+
+
+def fill(path, notes, size):
+    database = Database(path)
+    database.create_profile(NAME, 'password')
+    body = ('lorem ipsum dolor sit amet ' * (size // 27 + 1))[:size]
+    with database.transaction():
+        for i in range(notes):
+            database.cursor.execute(CREATE_NOTE, {'title': 'Note' + str(i), 'preview': body[:PREVIEW_LENGTH],
+                                                  'codec': None, 'size': size, 'content': body, 'date': time() + i,
+                                                  'name': NAME, 'favorite': False})
+    database.closeDB()
+
+
+def measure(path, mode):
+    database = Database(path)
+    start = perf_counter()
+    if mode == 'before':
+        notes = database.read_notes(NAME)
+    else:
+        profile = Profile(database)
+        profile.init(NAME, 'password', 0)
+        notes = profile.reload()
+        profile.read_note(notes[0][4])
+    elapsed = perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print('%-8s %8d notes %10.1f MB peak RSS %10.3f s' % (mode, len(notes), peak, elapsed))
+    database.closeDB()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--notes', type=int, default=1000)
+    parser.add_argument('--size', type=int, default=1024 * 1024)
+    parser.add_argument('--measure', nargs=2, metavar=('PATH', 'MODE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(*args.measure)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'Notes.db')
+        fill(path, args.notes, args.size)
+        for mode in ('before', 'after'):
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--measure', path, mode], check=True)
+
+
+if __name__ == '__main__':
+    main()
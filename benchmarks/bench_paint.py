@@ -0,0 +1,147 @@
+# Frame times of the login screen and the notes screen while the pointer sweeps over every profile button and note
+# card and while the window is resized back and forth. A frame is the event plus the repaint it causes, measured
+# offscreen with the real NoteApp against a generated Notes.db.
+#
+#   python benchmarks/bench_paint.py [--profiles 8] [--notes 200] [--rounds 10]
+
+import argparse
+import os
+import statistics
+import tempfile
+from time import perf_counter
+
+from common import NAME, generate
+
+from PyQt5.QtCore import Qt, QEvent, QPointF
+from PyQt5.QtGui import QHoverEvent
+from PyQt5.QtWidgets import QApplication
+
+from Database import Database
+
+# window sizes of a resize sweep, out and back
+SIZES = [(640 + step * 16, 480 + step * 12) for step in range(41)]
+SIZES += SIZES[-2::-1]
+
+
+def fill(path, profiles, notes):
+    # the notes are in the generated profile, the other profiles only have a button
+    generate(path, notes)
+    database = Database(path)
+    for i in range(profiles - 1):
+        database.create_profile('Profile' + str(i), 'password')
+    database.closeDB()
+
+
+def round_count(value):
+    # the first round is reported apart from the others, so there have to be others
+    count = int(value)
+    if count < 2:
+        raise argparse.ArgumentTypeError('at least 2 rounds are needed, not %d' % count)
+    return count
+
+
+def report(name, rounds):
+    # the first round paints every look for the first time, the others repeat it
+    summarize(name + ' (first)', rounds[0])
+    repeated = [time for times in rounds[1:] for time in times]
+    if repeated:
+        summarize(name + ' (repeated)', repeated)
+
+
+def summarize(name, times):
+    times = sorted(times)
+    print('%-28s %8.3f ms median %8.3f ms p95 %8.3f ms max   %d frames' % (
+        name, statistics.median(times) * 1000, times[int(len(times) * 0.95)] * 1000, times[-1] * 1000, len(times)))
+
+
+def frame(app, event):
+    start = perf_counter()
+    event()
+    app.processEvents()
+    return perf_counter() - start
+
+
+def hover_buttons(app, buttons, rounds):
+    def hover(button, under):
+        button.setAttribute(Qt.WA_UnderMouse, under)
+        button.update()
+
+    times = []
+    for _ in range(rounds):
+        times.append([])
+        for button in buttons:
+            times[-1].append(frame(app, lambda: hover(button, True)))
+            times[-1].append(frame(app, lambda: hover(button, False)))
+    return times
+
+
+def hover_cards(app, view, rounds):
+    viewport = view.viewport()
+    points = [QPointF(view.visualRect(view.model().index(row, 0)).center())
+              for row in range(view.model().rowCount())]
+    points = [point for point in points if viewport.rect().contains(point.toPoint())]
+    times = []
+    previous = QPointF(-1, -1)
+    for _ in range(rounds):
+        times.append([])
+        for point in points:
+            event = QHoverEvent(QEvent.HoverMove, point, previous)
+            times[-1].append(frame(app, lambda: QApplication.sendEvent(viewport, event)))
+            previous = point
+    return times
+
+
+def resize(app, window, rounds):
+    times = []
+    for _ in range(rounds):
+        times.append([])
+        for width, height in SIZES:
+            times[-1].append(frame(app, lambda: window.resize(width, height)))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--profiles', type=int, default=8)
+    parser.add_argument('--notes', type=int, default=200)
+    parser.add_argument('--rounds', type=round_count, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # NoteApp opens Notes.db in the working directory
+        os.chdir(directory)
+        fill('Notes.db', args.profiles, args.notes)
+
+        from NoteApp import NoteApp
+        from Widgets.MainMenu import NoteListView
+
+        app = QApplication([])
+        window = NoteApp()
+        window.showNormal()
+        window.resize(*SIZES[0])
+        login = window.currentWidget()
+        while not login.profile_buttons:
+            app.processEvents()
+        report('login hover', hover_buttons(app, [login.create_button] + login.profile_buttons, args.rounds))
+        report('login resize', resize(app, window, args.rounds))
+
+        window._NoteApp__profileLogin(NAME)
+
+        def notes_view():
+            # the view of the notes that are not favorites, the only ones there are
+            if str(window.currentWidget()) != 'main':
+                return None
+            views = window.currentWidget().findChildren(NoteListView)
+            return next((view for view in views if view.model().rowCount()), None)
+
+        while notes_view() is None:
+            app.processEvents()
+        app.processEvents()
+        report('notes hover', hover_cards(app, notes_view(), args.rounds))
+        report('notes resize', resize(app, window, args.rounds))
+
+        window.close()
+
+
+if __name__ == '__main__':
+    main()
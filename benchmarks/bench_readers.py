@@ -0,0 +1,73 @@
+# Latency of note updates while searches keep coming in: every request on the one database thread (before) against
+# searches on the read-only connections of Database.reading in a pool of threads next to it (after), as
+# DatabaseWorker.submit and submit_read do.
+#
+#   python benchmarks/bench_readers.py [--notes 5000] [--searches 200] [--writes 50] [--readers 4]
+
+import argparse
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, wait
+from statistics import median
+from time import perf_counter, sleep
+
+from common import NAME, generate
+
+from Database import Database
+
+# words of the generated prose
+SEARCHES = ['meeting', 'project', 'review', 'deadline', 'budget', 'summary', 'question', 'café']
+
+
+def measure(path, mode, notes, searches, writes, readers):
+    database = Database(path, readers=readers)
+    worker = ThreadPoolExecutor(1)
+    pool = ThreadPoolExecutor(readers)
+    noteIds = [note[4] for note in database.read_note_previews(NAME)]
+    # the worker opens its connection before the clock starts
+    worker.submit(database.read_note, noteIds[0], NAME).result()
+
+    def search(text):
+        if mode == 'before':
+            return database.search_notes(NAME, text)
+        with database.reading():
+            return database.search_notes(NAME, text)
+
+    def write(i, submitted):
+        note = database.read_note(noteIds[i % notes], NAME)
+        database.update_note(NAME, note[4], note[0], note[1] + ' kilo', False)
+        return perf_counter() - submitted
+
+    start = perf_counter()
+    reads = [(worker if mode == 'before' else pool).submit(search, SEARCHES[i % len(SEARCHES)])
+             for i in range(searches)]
+    latencies = []
+    for i in range(writes):
+        latencies.append(worker.submit(write, i, perf_counter()).result())
+        sleep(0.002)
+    wait(reads)
+    elapsed = perf_counter() - start
+    worker.shutdown()
+    pool.shutdown()
+    database.closeDB()
+    print('%-8s write median %8.2f ms  max %8.2f ms   %d searches and %d writes in %.2f s'
+          % (mode, median(latencies) * 1000, max(latencies) * 1000, searches, writes, elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--notes', type=int, default=5000)
+    parser.add_argument('--searches', type=int, default=200)
+    parser.add_argument('--writes', type=int, default=50)
+    parser.add_argument('--readers', type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'Notes.db')
+        generate(path, args.notes)
+        for mode in ['before', 'after']:
+            measure(path, mode, args.notes, args.searches, args.writes, args.readers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# Frame times of a scripted drag of the window edge over the login screen: the window is resized a few pixels every
+# 4 ms, faster than it can be repainted, and every step is timed with the events it causes, geometry updates that
+# were put off to a later step included. The real NoteApp runs offscreen against a generated Notes.db.
+#
+#   python benchmarks/bench_resize.py [--profiles 20] [--steps 500]
+
+import argparse
+import os
+import statistics
+import tempfile
+from time import perf_counter, sleep
+
+import common  # noqa: F401, puts the repository on sys.path
+
+from PyQt5.QtWidgets import QApplication
+
+from Database import Database
+
+# seconds between two resize events of the drag
+EVENT_INTERVAL = 0.004
+
+
+def fill(path, profiles):
+    database = Database(path)
+    for i in range(profiles):
+        database.create_profile('Profile' + str(i), 'password')
+    database.closeDB()
+
+
+def sweep(app, window, steps):
+    # out to twice the size and back, a couple of pixels per step like a drag
+    sizes = [(800 + round(800 * i / (steps // 2)), 600 + round(600 * i / (steps // 2))) for i in range(steps // 2)]
+    sizes += sizes[::-1]
+    times = []
+    for width, height in sizes:
+        start = perf_counter()
+        window.resize(width, height)
+        app.processEvents()
+        elapsed = perf_counter() - start
+        times.append(elapsed)
+        sleep(max(0.0, EVENT_INTERVAL - elapsed))
+    # the update for the last size
+    sleep(0.05)
+    start = perf_counter()
+    app.processEvents()
+    times[-1] += perf_counter() - start
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--profiles', type=int, default=20)
+    parser.add_argument('--steps', type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # NoteApp opens Notes.db in the working directory
+        os.chdir(directory)
+        fill('Notes.db', args.profiles)
+
+        from NoteApp import NoteApp
+
+        app = QApplication([])
+        window = NoteApp()
+        window.showNormal()
+        window.resize(800, 600)
+        login = window.currentWidget()
+        while not login.profile_buttons:
+            app.processEvents()
+        app.processEvents()
+
+        updates = []
+        update = login.updateGeometry
+        login.updateGeometry = lambda: (updates.append(None), update())
+        times = sorted(sweep(app, window, args.steps))
+        print('%d resizes, %d geometry updates, %.1f ms busy' % (len(times), len(updates), sum(times) * 1000))
+        print('frame %8.3f ms median %8.3f ms p95 %8.3f ms max' % (
+            statistics.median(times) * 1000, times[int(len(times) * 0.95)] * 1000, times[-1] * 1000))
+        final = login.profile_buttons[0].size()
+        print('buttons end at %dx%d for a %dx%d window' % (final.width(), final.height(), window.width(),
+                                                           window.height()))
+        window.close()
+
+
+if __name__ == '__main__':
+    main()
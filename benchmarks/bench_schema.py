@@ -0,0 +1,75 @@
+# Compares single note lookups by title against the original unkeyed Notes table with lookups by Id, the way notes
+# are read now, in the migrated one.
+#
+#   python benchmarks/bench_schema.py [rows ...]
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+from time import perf_counter, time
+
+import common  # noqa: F401, puts the repository on sys.path
+
+from Database import Database, CREATE_NOTES_TABLE, CREATE_PROFILES_TABLE
+
+PROFILES = 10
+LOOKUPS = 200
+
+
+def fill(path, rows):
+    connection = sqlite3.connect(path)
+    connection.execute(CREATE_PROFILES_TABLE)
+    connection.execute(CREATE_NOTES_TABLE)
+    connection.executemany('INSERT INTO Notes(Title, Content, Favorite, Date, Name) VALUES (?, ?, ?, ?, ?)',
+                           (('Note' + str(i), 'content ' * 8, i % 7 == 0, time() + i, 'Profile' + str(i % PROFILES))
+                            for i in range(rows)))
+    connection.commit()
+    connection.close()
+
+
+def time_lookups(read_note, keys):
+    start = perf_counter()
+    for key, name in keys:
+        read_note(key, name)
+    return (perf_counter() - start) / len(keys) * 1e6
+
+
+class LegacyDatabase:
+    # the lookup as it was done against the original table
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+
+    def read_note(self, title, name):
+        return self.connection.execute('SELECT * FROM Notes WHERE Title=? AND Name=?', (title, name)).fetchone()
+
+    def closeDB(self):
+        self.connection.close()
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]
+    print('%10s %14s %14s' % ('rows', 'legacy (us)', 'indexed (us)'))
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in sizes:
+            path = os.path.join(directory, 'Notes%d.db' % rows)
+            fill(path, rows)
+
+            sample = random.sample(range(rows), LOOKUPS)
+            legacy = LegacyDatabase(path)
+            legacyCost = time_lookups(legacy.read_note, [('Note' + str(i), 'Profile' + str(i % PROFILES))
+                                                         for i in sample])
+            legacy.closeDB()
+
+            database = Database(path)
+            ids = dict(database.connection.execute('SELECT Title, Id FROM Notes'))
+            indexedCost = time_lookups(database.read_note, [(ids['Note' + str(i)], 'Profile' + str(i % PROFILES))
+                                                            for i in sample])
+            database.closeDB()
+
+            print('%10d %14.1f %14.1f' % (rows, legacyCost, indexedCost))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,281 @@
+# Timings of the data layer and the GUI against generated profiles of 1k, 10k and 100k notes, written as JSON. A run
+# can be compared with a saved one, a timing whose median is slower than the baseline one by more than the spread
+# of the two runs (and by more than the threshold) is reported as a regression and makes the exit status 1.
+#
+#   python benchmarks/bench_suite.py [--notes 1000 10000 100000] [--output results.json]
+#   python benchmarks/bench_suite.py --output new.json --compare baseline.json [--threshold 0.05]
+#
+# The generated databases are the same for every run and are kept in --data (a temporary directory by default)
+# so later runs skip generating them. The bodies are slices of generated prose, most of them short and a few of
+# up to 64 KiB. The GUI timings run offscreen in a separate process for each profile.
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+from contextlib import contextmanager
+from time import perf_counter
+
+from common import NAME, SEED, generate
+
+from Database import Database, Profile, MIGRATIONS, NOTE_PAGE_SIZE
+
+# operations timed on their own, each one on a different note, the first WARMUP of them not counted
+WRITES = 50
+# untimed calls before the timed runs of an operation that can be repeated
+WARMUP = 3
+REPEAT = 15
+# seconds a timed run takes at least, a fast operation is called as often as it takes and timed per call
+RUN_TIME = 0.05
+# how many interquartile ranges of the two runs a median has to move by before it counts as a regression
+SPREAD = 1.5
+
+
+def prepare(directory, notes):
+    # the schema version is part of the name, a database of an older schema would be migrated on every open
+    path = os.path.join(directory, 'Notes-%d-%d-v%d.db' % (notes, SEED, len(MIGRATIONS)))
+    if not os.path.exists(path):
+        generate(path + '.tmp', notes)
+        os.replace(path + '.tmp', path)
+    return path
+
+
+def summary(times, calls=1):
+    quartiles = statistics.quantiles(times, n=4)
+    return {'median': statistics.median(times), 'min': min(times), 'max': max(times),
+            'iqr': quartiles[2] - quartiles[0], 'runs': len(times), 'calls': calls}
+
+
+@contextmanager
+def collector_paused():
+    # a collection in the middle of a timed run would be counted against whatever operation triggered it
+    gc.collect()
+    gc.disable()
+    try:
+        yield
+    finally:
+        gc.enable()
+
+
+def repeat(operations):
+    # operations maps names to a function and its arguments, called again and again. After the warmup they take
+    # turns for REPEAT rounds, so the machine slowing down for a while spreads the runs of every timing instead of
+    # moving the median of a few.
+    calls = {}
+    for name, (function, args) in operations.items():
+        for _ in range(WARMUP):
+            function(*args)
+        start = perf_counter()
+        function(*args)
+        calls[name] = max(1, int(RUN_TIME / (perf_counter() - start)))
+    times = {name: [] for name in operations}
+    for _ in range(REPEAT):
+        for name, (function, args) in operations.items():
+            with collector_paused():
+                start = perf_counter()
+                for _ in range(calls[name]):
+                    function(*args)
+                times[name].append((perf_counter() - start) / calls[name])
+    return {name: summary(times[name], calls[name]) for name in operations}
+
+
+def each(operations):
+    # operations maps names to a function and the arguments of each call, the calls take turns like in repeat
+    times = {name: [] for name in operations}
+    for i in range(max(len(items) for _, items in operations.values())):
+        for name, (function, items) in operations.items():
+            if i < len(items):
+                with collector_paused():
+                    start = perf_counter()
+                    function(*items[i])
+                    times[name].append(perf_counter() - start)
+    return {name: summary(times[name][WARMUP:]) for name in operations}
+
+
+def measure_data(path, notes):
+    results = {}
+    database = Database(path)
+    profile = Profile(database)
+    profile.init(NAME, 'password', 0)
+    generator = random.Random(SEED)
+    ids = dict(database.connection.execute('SELECT Title, Id FROM Notes WHERE Name=?', (NAME,)))
+    noteIds = [ids['Note' + str(i + 1)] for i in generator.sample(range(notes), WRITES * 2)]
+
+    last_page = database.connection.execute(
+        'SELECT Date, Id FROM Notes WHERE Name=? AND Favorite=0 ORDER BY Date DESC, Id DESC LIMIT 1 OFFSET ?',
+        (NAME, NOTE_PAGE_SIZE)).fetchone()
+    results.update(repeat({
+        'Database.read_notes': (database.read_notes, (NAME,)),
+        'Profile.reload': (profile.reload, ()),
+        'Profile.read_note_page (first page)': (profile.read_note_page, (False,)),
+        'Profile.read_note_page (last page)': (profile.read_note_page, (False, last_page)),
+    }))
+
+    updates = []
+    for noteId in noteIds[:WRITES]:
+        note = database.read_note_header(noteId, NAME)
+        updates.append((NAME, noteId, note[0], 'updated ' * generator.randint(8, 512), note[2]))
+    results.update(each({
+        'Profile.create_note': (profile.create_note, [()] * WRITES),
+        'Database.update_note': (database.update_note, updates),
+        'Profile.favorite_note': (profile.favorite_note, [(noteId, True) for noteId in noteIds[:WRITES]]),
+        'Database.delete_note': (database.delete_note, [(noteId, NAME) for noteId in noteIds[WRITES:]]),
+    }))
+    database.closeDB()
+    return results
+
+
+def measure_gui(path):
+    from PyQt5.QtWidgets import QApplication, QStackedWidget
+
+    from DatabaseWorker import DatabaseWorker
+    from MainUI import MainUI
+    from NoteUI import NoteUI
+
+    class Host(QStackedWidget):
+        # the parts of NoteApp the screens use, without the login screen
+        def __init__(self, worker, profile):
+            super().__init__()
+            self.__worker = worker
+            self.__profile = profile
+
+        def getProfile(self):
+            return self.__profile
+
+        def getWorker(self):
+            return self.__worker
+
+    connection = sqlite3.connect(path)
+    smallest = connection.execute('SELECT Id FROM Notes ORDER BY Size LIMIT 1').fetchone()[0]
+    largest = connection.execute('SELECT Id FROM Notes ORDER BY Size DESC LIMIT 1').fetchone()[0]
+    connection.close()
+
+    app = QApplication([])
+    worker = DatabaseWorker(path)
+    worker.start()
+    worker.wait_ready()
+    profile = Profile(worker.database)
+    profile.init(NAME, 'password', 0)
+    host = Host(worker, profile)
+    host.resize(800, 600)
+    main = MainUI(host)
+    note = NoteUI(host)
+    host.addWidget(main)
+    host.addWidget(note)
+    host.show()
+    app.processEvents()
+
+    def wait(finished):
+        while not finished():
+            app.processEvents()
+        app.processEvents()
+
+    def reload():
+        host.setCurrentWidget(main)
+        main.reloadUI()
+        wait(main._MainUI__loading.isHidden)
+
+    def open_note(noteId):
+        host.setCurrentWidget(note)
+        note.setNote(noteId)
+        wait(note._NoteUI__progressBar.isHidden)
+
+    results = repeat({
+        'MainUI.reloadUI': (reload, ()),
+        'NoteUI.setNote (smallest note)': (open_note, (smallest,)),
+        'NoteUI.setNote (largest note)': (open_note, (largest,)),
+    })
+
+    worker.stop()
+    return results
+
+
+def run(directory, counts):
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        for notes in counts:
+            path = prepare(directory, notes)
+            print('%d notes' % notes, file=sys.stderr)
+
+            # every measurement gets its own copy, the writes would change the database for the next run
+            copy = os.path.join(scratch, 'Notes.db')
+            shutil.copyfile(path, copy)
+            timings = measure_data(copy, notes)
+            shutil.copyfile(path, copy)
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--gui', copy], check=True,
+                                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout
+            timings.update(json.loads(output))
+
+            for name, timing in timings.items():
+                results['%s/%d' % (name, notes)] = timing
+    return results
+
+
+def compare(results, baseline, threshold):
+    # A timing regressed when its median is slower than the baseline one by more than SPREAD times the interquartile
+    # ranges of both runs together, the noise they measured, and by more than threshold (a fraction) of the baseline.
+    regressions = []
+    for name, timing in sorted(results.items()):
+        if name not in baseline:
+            continue
+        before = baseline[name]
+        slower = timing['median'] - before['median']
+        noise = SPREAD * (before.get('iqr', 0) + timing['iqr'])
+        regressed = slower > noise and slower > threshold * before['median']
+        print('%-45s %10.4f s %10.4f s %+8.1f%% %8.1f%% %s' % (
+            name, before['median'], timing['median'], slower / before['median'] * 100,
+            noise / before['median'] * 100, 'REGRESSION' if regressed else ''))
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def environment():
+    from PyQt5.QtCore import QT_VERSION_STR
+
+    return {'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version, 'qt': QT_VERSION_STR,
+            'platform': platform.platform(), 'machine': platform.machine()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--notes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--data', default=os.path.join(tempfile.gettempdir(), 'notes-benchmarks'))
+    parser.add_argument('--output')
+    parser.add_argument('--compare', metavar='BASELINE')
+    parser.add_argument('--threshold', type=float, default=0.05)
+    parser.add_argument('--gui', metavar='PATH', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.gui:
+        print(json.dumps(measure_gui(args.gui)))
+        return
+
+    os.makedirs(args.data, exist_ok=True)
+    report = {'environment': environment(), 'results': run(args.data, args.notes)}
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + '\n')
+    elif not args.compare:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if baseline['environment'] != report['environment']:
+            print('baseline was recorded in a different environment, timings may not be comparable', file=sys.stderr)
+        if compare(report['results'], baseline['results'], args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
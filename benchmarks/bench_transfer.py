@@ -0,0 +1,68 @@
+# Throughput and peak RSS of moving a JSONL archive of notes into a profile and back out: one note at a time the
+# way the GUI creates and saves them, with every body read at once by read_notes (before), against Transfer's
+# batched import and streamed export (after). Each mode runs in its own process.
+#
+#   python benchmarks/bench_transfer.py [--notes 5000] [--size 16384]
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+from time import perf_counter
+
+from common import NAME, generate_notes
+
+from Database import Database, Profile
+import Transfer
+
+
+def measure(directory, mode):
+    database = Database(os.path.join(directory, mode + '.db'))
+    database.create_profile(NAME, 'password')
+    archive = os.path.join(directory, 'notes.jsonl')
+    output = os.path.join(directory, mode + '.jsonl')
+
+    start = perf_counter()
+    if mode == 'before':
+        for title, content, date, favorite in Transfer.read_archive(archive):
+            noteId = database.create_note(NAME, title)
+            database.update_note(NAME, noteId, title, content, favorite)
+    else:
+        profile = Profile(database)
+        profile.init(NAME, 'password', 0)
+        Transfer.import_notes(profile, archive)
+    imported = perf_counter() - start
+
+    start = perf_counter()
+    if mode == 'before':
+        Transfer.write_archive(output, (note[:4] for note in database.read_notes(NAME)))
+    else:
+        Transfer.export_notes(profile, output)
+    exported = perf_counter() - start
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print('%-8s import %8.2f s   export %8.2f s   %10.1f MB peak RSS' % (mode, imported, exported, peak))
+    database.closeDB()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--notes', type=int, default=5000)
+    parser.add_argument('--size', type=int, default=16384)
+    parser.add_argument('--measure', nargs=2, metavar=('DIRECTORY', 'MODE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(*args.measure)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        Transfer.write_archive(os.path.join(directory, 'notes.jsonl'), generate_notes(args.notes, [args.size], [1]))
+        for mode in ('before', 'after'):
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--measure', directory, mode], check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+# What the benchmarks share: the repository on sys.path, Qt offscreen for the ones that show windows, and the
+# generated profile of notes they run against. Imported first by every benchmark:
+#
+#   from common import NAME, ROOT, generate
+
+import os
+import random
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from Database import Database, UPDATE_NOTE_COUNTER  # noqa: E402
+
+NAME = 'Benchmark'
+SEED = 2024
+# body sizes in characters and how often they occur
+BODY_SIZES = [64, 512, 4096, 65536]
+BODY_WEIGHTS = [50, 35, 14, 1]
+FAVORITES = 0.05
+WORDS = ['the', 'note', 'of', 'and', 'a', 'to', 'meeting', 'in', 'is', 'project', 'for', 'with', 'on', 'review',
+         'deadline', 'draft', 'idea', 'list', 'todo', 'call', 'budget', 'plan', 'week', 'done', 'later', 'ask',
+         'summary', 'result', 'question', 'follow', 'up', 'über', 'café', 'naïve', '✓']
+
+
+def generate_notes(notes, sizes=BODY_SIZES, weights=BODY_WEIGHTS):
+    # (title, content, date, favorite) of Note1 to Note<notes>, the same ones on every call. The bodies are slices
+    # of generated prose.
+    generator = random.Random(SEED)
+    text = ' '.join(generator.choices(WORDS, k=max(40000, max(sizes) // 2)))
+    for i in range(notes):
+        size = generator.choices(sizes, weights)[0]
+        start = generator.randrange(len(text) - size)
+        yield 'Note' + str(i + 1), text[start:start + size], 1600000000 + i, generator.random() < FAVORITES
+
+
+def generate(path, notes, sizes=BODY_SIZES, weights=BODY_WEIGHTS):
+    # the profile NAME, password 'password', with the notes of generate_notes in the Notes.db at path
+    database = Database(path)
+    database.create_profile(NAME, 'password')
+    database.import_notes(NAME, generate_notes(notes, sizes, weights))
+    with database.transaction():
+        database.cursor.execute(UPDATE_NOTE_COUNTER, {'counter': notes, 'name': NAME})
+    database.closeDB()
@@ -1,18 +1,79 @@
+import os
 import sys
+from time import perf_counter
 
-from PyQt5.QtWidgets import QApplication
+# start up phases and when they finished, reported by --startup-time
+phases = [('main.py', perf_counter())]
 
-from NoteApp import NoteApp
+from PyQt5.QtCore import QObject, QEvent, QTimer  # noqa: E402
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+
+phases.append(('import PyQt5', perf_counter()))
+
+from NoteApp import NoteApp  # noqa: E402
+
+phases.append(('import NoteApp', perf_counter()))
 
 
 def except_hook(cls, exception, traceback):
     sys.__excepthook__(cls, exception, traceback)
 
 
+def trace(phase):
+    phases.append((phase, perf_counter()))
+
+
+def process_age():
+    # seconds since the process started, the interpreter's own start up included, where /proc can tell
+    try:
+        with open('/proc/self/stat') as file:
+            started = int(file.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as file:
+            uptime = float(file.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return uptime - started / os.sysconf('SC_CLK_TCK')
+
+
+class FirstFrame(QObject):
+    # calls callback once the window has painted for the first time
+    def __init__(self, window, callback):
+        super().__init__(window)
+        self.__window = window
+        self.__callback = callback
+        window.installEventFilter(self)
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Paint:
+            self.__window.removeEventFilter(self)
+            # queued so the paint that is about to happen counts
+            QTimer.singleShot(0, self.__callback)
+        return False
+
+
+def report_startup_time():
+    trace('first frame')
+    age = process_age()
+    start = phases[0][1]
+    if age is not None:
+        # the time before main.py ran, measured by the system clock, /proc counts in clock ticks
+        start = perf_counter() - age
+        print('%-16s %8.1f ms' % ('interpreter', (phases[0][1] - start) * 1000))
+    previous = phases[0][1]
+    for phase, finished in phases[1:]:
+        print('%-16s %8.1f ms' % (phase, (finished - previous) * 1000))
+        previous = finished
+    print('%-16s %8.1f ms' % ('total', (previous - start) * 1000))
+    QApplication.quit()
+
+
 if __name__ == "__main__":
     sys.excepthook = except_hook
 
-app = QApplication(sys.argv)
-win = NoteApp()
+    app = QApplication(sys.argv)
+    trace('QApplication')
+    win = NoteApp(trace)
+    if '--startup-time' in sys.argv:
+        FirstFrame(win, report_startup_time)
 
-sys.exit(app.exec_())
+    sys.exit(app.exec_())